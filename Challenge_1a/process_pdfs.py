@@ -12,14 +12,209 @@ Performance targets:
 """
 
 import fitz  # PyMuPDF
+import numpy as np
 import json
 import re
 import os
 from pathlib import Path
 from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from typing import List, Dict, Tuple, Optional, Any
 import sys
 
+try:
+    from numba import njit, prange
+except ImportError:  # Numba is optional; the NumPy expression is used instead
+    njit = None
+
+try:
+    import orjson
+    
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:  # Fall back to the (identical-output) stdlib encoder
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+# Patterns applied once per text span; compiled once at import
+_RE_REVISION = re.compile(r"^\d+\.\d+\s+\d{1,2}\s+(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)")
+_RE_VERSION = re.compile(r"^version\s+\d+\.\d+")
+_RE_SEPARATOR = re.compile(r"^[-=_*•]+$")
+_RE_NUM_DOT_CAP = re.compile(r"^\d+\.\s+[A-Z]")  # "1. Introduction"
+_RE_TITLE_CASE = re.compile(r"^[A-Z][a-z]+(\s+[A-Z][a-z]+)*\s*$")  # Title case like "Introduction to Something"
+_RE_ALLCAPS = re.compile(r"^[A-Z\s]+$")  # ALL CAPS (but not too long)
+
+_HEADING_PATTERNS = (_RE_NUM_DOT_CAP, _RE_TITLE_CASE, _RE_ALLCAPS)
+_SEPARATOR_CHARS = frozenset("-=_*•")
+_NON_HEADING_WORDS = ("copyright", "©", "page", "version 2014")
+
+# Text-only extraction flags ("dict" defaults minus image blocks), so MuPDF never decodes images
+_TEXT_FLAGS = fitz.TEXTFLAGS_TEXT
+
+
+def _numbering_level(text: str) -> int:
+    """
+    Return the numbering depth of a heading like '1.2.3 Title' (3), else 0.
+    
+    Equivalent to matching r"^(\d+(?:\.\d+)*)\.?\s+" but rejects the common
+    case of text not starting with a digit without entering the regex engine.
+    """
+    n = len(text)
+    if not n or not text[0].isdecimal():
+        return 0
+    
+    i = 1
+    while i < n and text[i].isdecimal():
+        i += 1
+    
+    dots = 0
+    while i < n - 1 and text[i] == '.' and text[i + 1].isdecimal():
+        dots += 1
+        i += 2
+        while i < n and text[i].isdecimal():
+            i += 1
+    
+    if i < n and text[i] == '.':
+        i += 1
+    
+    if i < n and text[i].isspace():
+        return dots + 1
+    return 0
+
+
+
+def _strong_style_mask(font_sizes: np.ndarray, bold_mask: np.ndarray, body_size: float) -> np.ndarray:
+    """Spans much larger than body text, or bold and moderately larger."""
+    return (font_sizes > body_size * 1.3) | (bold_mask & (font_sizes > body_size * 1.1))
+
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _score_candidates(font_sizes, bold_mask, body_size):
+        """JIT-compiled equivalent of _strong_style_mask."""
+        large_size = body_size * 1.3
+        bold_size = body_size * 1.1
+        result = np.empty(font_sizes.shape[0], dtype=np.bool_)
+        for i in prange(font_sizes.shape[0]):
+            size = font_sizes[i]
+            result[i] = size > large_size or (bold_mask[i] and size > bold_size)
+        return result
+else:
+    _score_candidates = _strong_style_mask
+
+
+class TextBlocks:
+    """
+    Struct-of-arrays store for extracted text spans.
+    
+    Numeric span attributes live in NumPy columns so the filtering passes can
+    work on whole-document boolean masks; strings stay in parallel Python
+    lists indexed by row. Font names are stored once and referenced by id.
+    """
+    
+    # Columns of the geometry array
+    FONT_SIZE, X0, Y0, X1, Y1 = range(5)
+    
+    def __init__(self, capacity: int = 1024, font_names: Optional[List[str]] = None):
+        self.geometry = np.empty((capacity, 5), dtype=np.float64)
+        self.pages = np.empty(capacity, dtype=np.int32)
+        self.font_ids = np.empty(capacity, dtype=np.int32)
+        self.flags = np.empty(capacity, dtype=np.uint8)
+        self.texts: List[str] = []
+        
+        # Font id -> name, shared with stores derived from this one
+        self.font_names = font_names if font_names is not None else []
+        self._font_index = {name: i for i, name in enumerate(self.font_names)}
+    
+    def __len__(self) -> int:
+        return len(self.texts)
+    
+    def font_id(self, font_name: str) -> int:
+        """Return the integer id for a font name, registering it on first use."""
+        # PyMuPDF hands back a fresh string per span for the same handful of fonts;
+        # interning makes the index lookup an identity hit and keeps one copy alive
+        font_name = sys.intern(font_name)
+        font_id = self._font_index.get(font_name)
+        if font_id is None:
+            font_id = self._font_index[font_name] = len(self.font_names)
+            self.font_names.append(font_name)
+        return font_id
+    
+    def append(self, text: str, page: int, bbox: Tuple[float, float, float, float],
+               font_size: float, font_id: int, flags: int):
+        """Append one span, growing the preallocated columns geometrically."""
+        row = len(self.texts)
+        if row == len(self.pages):
+            self._grow(max(2 * row, 16))
+        
+        geometry = self.geometry[row]
+        geometry[self.FONT_SIZE] = font_size
+        geometry[self.X0:] = bbox
+        self.pages[row] = page
+        self.font_ids[row] = font_id
+        self.flags[row] = flags
+        self.texts.append(text)
+    
+    def _grow(self, capacity: int):
+        for name in ("geometry", "pages", "font_ids", "flags"):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+    
+    def trim(self) -> "TextBlocks":
+        """Drop the unused preallocated tail once all spans are appended."""
+        n = len(self.texts)
+        self.geometry = self.geometry[:n]
+        self.pages = self.pages[:n]
+        self.font_ids = self.font_ids[:n]
+        self.flags = self.flags[:n]
+        return self
+    
+    def take(self, rows: List[int]) -> "TextBlocks":
+        """Return a new store holding copies of the given rows, in order."""
+        taken = TextBlocks(0, font_names=self.font_names)
+        taken.geometry = self.geometry[rows]
+        taken.pages = self.pages[rows]
+        taken.font_ids = self.font_ids[rows]
+        taken.flags = self.flags[rows]
+        taken.texts = [self.texts[i] for i in rows]
+        return taken
+    
+    @property
+    def font_sizes(self) -> np.ndarray:
+        return self.geometry[:len(self), self.FONT_SIZE]
+    
+    @property
+    def x_pos(self) -> np.ndarray:
+        return self.geometry[:len(self), self.X0]
+    
+    @property
+    def y_pos(self) -> np.ndarray:
+        return self.geometry[:len(self), self.Y0]
+    
+    @property
+    def is_bold(self) -> np.ndarray:
+        return (self.flags[:len(self)] & 16).astype(bool)  # Bold flag in PyMuPDF
+    
+    def row(self, i: int) -> Dict[str, Any]:
+        """Materialize a single span as a block dictionary."""
+        font_size, x0, y0, x1, y1 = self.geometry[i].tolist()
+        flags = int(self.flags[i])
+        return {
+            "text": self.texts[i],
+            "page": int(self.pages[i]),
+            "bbox": (x0, y0, x1, y1),
+            "font_size": font_size,
+            "font_name": self.font_names[self.font_ids[i]],
+            "is_bold": bool(flags & 16),
+            "flags": flags,
+            "x_pos": x0,  # Left position for indentation analysis
+            "y_pos": y0  # Top position for spacing analysis
+        }
+
 
 class PDFOutlineExtractor:
     """High-performance PDF outline extraction using multi-pass analysis."""
@@ -37,94 +232,78 @@ class PDFOutlineExtractor:
         # Ensure output directory exists
         self.output_dir.mkdir(parents=True, exist_ok=True)
     
-    def extract_text_blocks(self, doc: fitz.Document) -> List[Dict[str, Any]]:
+    def extract_text_blocks(self, doc: fitz.Document) -> Tuple[TextBlocks, Dict[str, Any]]:
         """
-        Pass 1: Extract all text blocks with detailed metadata.
+        Pass 1: Extract all text blocks and build the document profile in one walk.
         
-        Returns list of text blocks with font info, coordinates, and styling.
+        Returns (text_blocks, profile). Text blocks carry font info, coordinates
+        and styling; the profile holds the body text size, font statistics and
+        average line spacing used as the baseline for later passes.
         """
-        text_blocks = []
+        text_blocks = TextBlocks()
+        font_size_counter = Counter()
+        spacing_sum = 0.0
+        spacing_count = 0
         
-        for page_num in range(len(doc)):
-            page = doc[page_num]
+        for page_num, page in enumerate(doc.pages(), start=1):  # 1-indexed pages
+            prev_y = None  # Spacing is only meaningful between spans on the same page
             
-            # Get text as dictionary with detailed formatting info
-            text_dict = page.get_text("dict")
+            # Get text as dictionary with detailed formatting info (text blocks only)
+            text_dict = page.get_text("dict", flags=_TEXT_FLAGS)
             
             for block in text_dict["blocks"]:
-                if "lines" not in block:  # Skip image blocks
-                    continue
-                    
                 for line in block["lines"]:
                     for span in line["spans"]:
                         # Extract text and clean it
                         text = span["text"].strip()
                         if not text:
                             continue
-                            
+                        
                         # Get font properties
                         font_size = span["size"]
-                        font_name = span["font"]
                         bbox = span["bbox"]
-                        flags = span["flags"]
+                        y_pos = bbox[1]
                         
-                        # Determine if text is bold
-                        is_bold = bool(flags & 2**4)  # Bold flag in PyMuPDF
+                        font_size_counter[font_size] += 1
                         
-                        text_block = {
-                            "text": text,
-                            "page": page_num + 1,  # 1-indexed pages
-                            "bbox": bbox,
-                            "font_size": font_size,
-                            "font_name": font_name,
-                            "is_bold": is_bold,
-                            "flags": flags,
-                            "x_pos": bbox[0],  # Left position for indentation analysis
-                            "y_pos": bbox[1],  # Top position for spacing analysis
-                            "width": bbox[2] - bbox[0],
-                            "height": bbox[3] - bbox[1]
-                        }
+                        if prev_y is not None:
+                            spacing = y_pos - prev_y
+                            if 5 < spacing < 50:  # Reasonable line spacing range
+                                spacing_sum += spacing
+                                spacing_count += 1
+                        prev_y = y_pos
                         
-                        text_blocks.append(text_block)
-        
-        return text_blocks
-    
-    def analyze_document_profile(self, text_blocks: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """
-        Pass 1: Analyze document to identify body text and establish baseline.
+                        text_blocks.append(
+                            text,
+                            page_num,
+                            bbox,
+                            font_size,
+                            text_blocks.font_id(span["font"]),
+                            span["flags"]
+                        )
+            
+            # Release the page and its text tree before loading the next one
+            page = text_dict = None
         
-        Returns document profile with body text size, font statistics, etc.
-        """
-        if not text_blocks:
-            return {"body_text_size": 12, "font_sizes": [], "avg_line_spacing": 15}
+        text_blocks.trim()
         
-        # Collect font size statistics
-        font_sizes = [block["font_size"] for block in text_blocks]
-        font_size_counter = Counter(font_sizes)
+        if not len(text_blocks):
+            return text_blocks, {"body_text_size": 12, "font_sizes": [], "avg_line_spacing": 15}
         
         # Most common font size is likely body text
         body_text_size = font_size_counter.most_common(1)[0][0]
+        avg_line_spacing = spacing_sum / spacing_count if spacing_count else 15
         
-        # Calculate average line spacing for the document
-        y_positions = [block["y_pos"] for block in text_blocks]
-        y_positions.sort()
-        
-        line_spacings = []
-        for i in range(1, len(y_positions)):
-            spacing = y_positions[i] - y_positions[i-1]
-            if 5 < spacing < 50:  # Reasonable line spacing range
-                line_spacings.append(spacing)
-        
-        avg_line_spacing = sum(line_spacings) / len(line_spacings) if line_spacings else 15
-        
-        return {
+        profile = {
             "body_text_size": body_text_size,
-            "font_sizes": sorted(set(font_sizes), reverse=True),
+            "font_sizes": sorted(font_size_counter, reverse=True),
             "avg_line_spacing": avg_line_spacing,
             "font_size_distribution": dict(font_size_counter)
         }
+        
+        return text_blocks, profile
     
-    def identify_heading_candidates(self, text_blocks: List[Dict[str, Any]], 
+    def identify_heading_candidates(self, text_blocks: TextBlocks,
                                   profile: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
         Pass 2: Identify potential heading candidates using multiple criteria.
@@ -138,182 +317,177 @@ class PDFOutlineExtractor:
         # Merge adjacent text blocks that might be split heading text
         merged_blocks = self._merge_split_headings(text_blocks)
         
-        # Sort blocks by page and vertical position
-        merged_blocks.sort(key=lambda x: (x["page"], x["y_pos"]))
+        # Font-size criteria for every block at once; thresholds are computed once
+        large_size = body_text_size * 1.3  # Significantly larger than body text
+        small_size = body_text_size * 0.85
+        font_sizes = merged_blocks.font_sizes
+        is_large = font_sizes > large_size
+        strong_style = _score_candidates(np.ascontiguousarray(font_sizes), merged_blocks.is_bold,
+                                         float(body_text_size))
+        is_small = font_sizes < small_size
+        in_title_zone = is_large & (merged_blocks.pages == 1) & (merged_blocks.y_pos < 300)
+        
+        # Plain lists avoid a NumPy scalar lookup per block inside the loop
+        strong_style = strong_style.tolist()
+        is_small = is_small.tolist()
+        in_title_zone = in_title_zone.tolist()
         
-        # Identify distinct font styles and their characteristics
-        font_styles = self._analyze_font_styles(merged_blocks)
+        # Visit blocks by page and vertical position
+        order = np.lexsort((merged_blocks.y_pos, merged_blocks.pages))
         
-        for block in merged_blocks:
-            text = block["text"].strip()
-            font_size = block["font_size"]
+        for i in order.tolist():
+            text = merged_blocks.texts[i].strip()
             
             # Skip very small text or single characters
             if len(text) < 3:
                 continue
             
             # Skip obvious non-headings
-            if self._is_non_heading(text, block, body_text_size):
+            if self._is_non_heading(text, is_small[i]):
                 continue
             
             # Check for numbering patterns (strong heading indicator)
-            has_numbering = bool(re.match(r"^\d+(\.\d+)*\.?\s+", text))
+            numbering_level = _numbering_level(text)
+            has_numbering = numbering_level > 0
             
             # Check if this text block has heading characteristics
             is_heading_candidate = self._evaluate_heading_candidate(
-                block, text, body_text_size, font_styles, has_numbering
+                text, strong_style[i], has_numbering
             )
             
             # Additional heuristics for title detection
-            is_potential_title = (
-                block["page"] == 1 and  # On first page
-                font_size > body_text_size * 1.3 and  # Significantly larger
-                block["y_pos"] < 300 and  # Near top of page
+            is_potential_title = bool(
+                in_title_zone[i] and  # Large text near the top of the first page
                 len(text) <= 100 and  # Reasonable title length
                 not has_numbering  # Titles usually don't have numbering
             )
             
             if is_heading_candidate or is_potential_title:
-                candidate = block.copy()
+                candidate = merged_blocks.row(i)
                 candidate["has_numbering"] = has_numbering
-                candidate["numbering_level"] = self._get_numbering_level(text) if has_numbering else None
+                candidate["numbering_level"] = numbering_level if has_numbering else None
                 candidate["is_potential_title"] = is_potential_title
                 candidates.append(candidate)
         
         return candidates
     
-    def _merge_split_headings(self, text_blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _merge_split_headings(self, text_blocks: TextBlocks) -> TextBlocks:
         """Merge adjacent text blocks that are likely split parts of a single heading."""
-        if not text_blocks:
-            return []
-        
-        merged = []
-        current_block = text_blocks[0].copy()
-        
-        for i in range(1, len(text_blocks)):
-            block = text_blocks[i]
+        n = len(text_blocks)
+        if not n:
+            return text_blocks.take([])
+        
+        FONT_SIZE, X0, Y0, X1, Y1 = range(5)  # TextBlocks geometry columns
+        geometry = text_blocks.geometry
+        pages = text_blocks.pages
+        is_bold = text_blocks.is_bold
+        font_sizes = geometry[:, FONT_SIZE]
+        y_pos = geometry[:, Y0]
+        
+        # A row merges into the current block when, compared with the block's
+        # first row, it is on the same page and line, has the same font size and
+        # bold status, and lies to the right. Every row of a block is within 5pt
+        # (y) and 1pt (size) of that first row, so neighbouring rows of one block
+        # differ by less than twice that: rows failing this test start a new block
+        may_continue = (
+            (pages[1:] == pages[:-1]) &
+            (is_bold[1:] == is_bold[:-1]) &
+            (np.abs(y_pos[1:] - y_pos[:-1]) < 10) &
+            (np.abs(font_sizes[1:] - font_sizes[:-1]) < 2)
+        )
+        is_start = np.ones(n, dtype=bool)
+        is_start[1:] = ~may_continue
+        
+        # Check the remaining rows against the first row of their block
+        prev_start = np.maximum.accumulate(np.where(is_start, np.arange(n), 0)).tolist()
+        rows = geometry.tolist()
+        start = 0
+        for i in np.flatnonzero(~is_start).tolist():
+            start = max(start, prev_start[i])
+            block = rows[i]
+            current = rows[start]
             
-            # Check if this block should be merged with the current one
             should_merge = (
-                block["page"] == current_block["page"] and
-                abs(block["y_pos"] - current_block["y_pos"]) < 5 and  # Same line
-                abs(block["font_size"] - current_block["font_size"]) < 1 and  # Same font size
-                block["is_bold"] == current_block["is_bold"] and  # Same bold status
-                block["x_pos"] > current_block["x_pos"]  # To the right
+                abs(block[Y0] - current[Y0]) < 5 and  # Same line
+                abs(block[FONT_SIZE] - current[FONT_SIZE]) < 1 and  # Same font size
+                block[X0] > current[X0]  # To the right
             )
-            
-            if should_merge:
-                # Merge the text
-                current_block["text"] += " " + block["text"].strip()
-                # Update bounding box
-                current_block["bbox"] = [
-                    current_block["bbox"][0],  # Keep left x
-                    current_block["bbox"][1],  # Keep top y
-                    block["bbox"][2],          # Update right x
-                    max(current_block["bbox"][3], block["bbox"][3])  # Update bottom y
-                ]
-                current_block["width"] = current_block["bbox"][2] - current_block["bbox"][0]
-            else:
-                merged.append(current_block)
-                current_block = block.copy()
-        
-        merged.append(current_block)
+            if not should_merge:
+                is_start[i] = True
+                start = i
+        
+        # Merged blocks span rows [starts[k], ends[k])
+        starts = np.flatnonzero(is_start)
+        ends = np.append(starts[1:], n)
+        
+        # Keep left x and top y of the first row, extend right x and bottom y
+        merged = text_blocks.take(starts)
+        merged.geometry[:, X1] = geometry[ends - 1, X1]
+        merged.geometry[:, Y1] = np.maximum.reduceat(geometry[:, Y1], starts)
+        
+        # Join the text of the (few) blocks made of more than one row
+        texts = text_blocks.texts
+        for k in np.flatnonzero(ends - starts > 1).tolist():
+            merged.texts[k] = " ".join(texts[starts[k]:ends[k]])
+        
         return merged
     
-    def _analyze_font_styles(self, text_blocks: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Analyze font styles in the document to understand hierarchy."""
-        font_stats = {}
+    def _is_non_heading(self, text: str, is_small: bool) -> bool:
+        """Check if text is obviously not a heading (cheapest checks first)."""
+        # Skip very small text
+        if is_small:
+            return True
+        
+        # Skip paragraph-length text
+        if len(text) > 200:
+            return True
         
-        for block in text_blocks:
-            font_key = block["font_name"]
-            if font_key not in font_stats:
-                font_stats[font_key] = {"count": 0, "sizes": [], "bold_count": 0}
-            
-            font_stats[font_key]["count"] += 1
-            font_stats[font_key]["sizes"].append(block["font_size"])
-            if block["is_bold"]:
-                font_stats[font_key]["bold_count"] += 1
-        
-        # Calculate average sizes and boldness ratios
-        for font_key in font_stats:
-            sizes = font_stats[font_key]["sizes"]
-            font_stats[font_key]["avg_size"] = sum(sizes) / len(sizes)
-            font_stats[font_key]["max_size"] = max(sizes)
-            font_stats[font_key]["bold_ratio"] = font_stats[font_key]["bold_count"] / font_stats[font_key]["count"]
-        
-        return font_stats
-    
-    def _is_non_heading(self, text: str, block: Dict[str, Any], body_text_size: float) -> bool:
-        """Check if text is obviously not a heading."""
         text_lower = text.lower()
         
+        # Skip copyright and page references
+        if any(word in text_lower for word in _NON_HEADING_WORDS):
+            return True
+        
+        first = text_lower[0]
+        
         # Skip revision history entries
-        if re.match(r"^\d+\.\d+\s+\d{1,2}\s+(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)", text_lower):
+        if first.isdigit() and _RE_REVISION.match(text_lower):
             return True
-            
+        
         # Skip version numbers
-        if re.match(r"^version\s+\d+\.\d+", text_lower):
-            return True
-            
-        # Skip copyright and page references
-        if any(word in text_lower for word in ["copyright", "©", "page", "version 2014"]):
-            return True
-            
-        # Skip very small text
-        if block["font_size"] < body_text_size * 0.85:
+        if first == "v" and _RE_VERSION.match(text_lower):
             return True
-            
+        
         # Skip decorative separators
-        if re.match(r"^[-=_*•]+$", text.strip()):
+        if first in _SEPARATOR_CHARS and _RE_SEPARATOR.match(text):
             return True
-            
+        
         return False
     
-    def _evaluate_heading_candidate(self, block: Dict[str, Any], text: str, 
-                                   body_text_size: float, font_styles: Dict, 
+    def _evaluate_heading_candidate(self, text: str, strong_style: bool,
                                    has_numbering: bool) -> bool:
         """Evaluate if a text block is likely a heading candidate."""
-        font_size = block["font_size"]
-        is_bold = block["is_bold"]
-        
         # Strong indicators
         if has_numbering:
             return True
-            
-        # Font size significantly larger than body text
-        if font_size > body_text_size * 1.3:
-            return True
-            
-        # Bold text that's larger than body text
-        if is_bold and font_size > body_text_size * 1.1:
+        
+        # Font size significantly larger than body text, or bold and larger
+        if strong_style:
             return True
-            
+        
         # Check for specific heading patterns in text
-        heading_patterns = [
-            r"^\d+\.\s+[A-Z]",  # "1. Introduction"
-            r"^[A-Z][a-z]+(\s+[A-Z][a-z]+)*\s*$",  # Title case like "Introduction to Something"
-            r"^[A-Z\s]+$",  # ALL CAPS (but not too long)
-        ]
-        
-        for pattern in heading_patterns:
-            if re.match(pattern, text) and len(text) <= 80:
+        for pattern in _HEADING_PATTERNS:
+            if pattern.match(text) and len(text) <= 80:
                 return True
-                
+        
         return False
     
-    def _get_numbering_level(self, text: str) -> Optional[int]:
-        """Extract numbering level from numbered heading (e.g., '1.2.3' -> 3)."""
-        match = re.match(r"^(\d+(?:\.\d+)*)\.?\s+", text)
-        if match:
-            numbers = match.group(1)
-            return numbers.count('.') + 1  # Count dots + 1 for level
-        return None
-    
     def classify_heading_hierarchy(self, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Pass 3: Classify candidates into title, H1, H2, H3 hierarchy.
         
         Uses font size, numbering patterns, and indentation to determine levels.
+        Headings are returned as (level, text, page) tuples.
         """
         if not candidates:
             return []
@@ -343,26 +517,25 @@ class PDFOutlineExtractor:
             style_key = (candidate["font_size"], candidate["is_bold"])
             style_groups[style_key].append(candidate)
         
-        # Sort style groups by font size (descending)
+        # Sort style groups by font size (descending) and index their ranks
         sorted_styles = sorted(style_groups.keys(), key=lambda x: x[0], reverse=True)
+        style_ranks = {style: rank for rank, style in enumerate(sorted_styles)}
         
         # Assign heading levels
         classified_headings = []
         
         for candidate in heading_candidates:
-            level = self._determine_heading_level(candidate, sorted_styles, style_groups)
+            level = self._determine_heading_level(candidate, style_ranks, style_groups)
             
             if level:
-                classified_headings.append({
-                    "level": level,
-                    "text": candidate["text"],
-                    "page": candidate["page"]
-                })
+                classified_headings.append((level, candidate["text"], candidate["page"]))
+        
+        # Sort by page and position (of the first candidate carrying each text)
+        y_pos_by_text = {}
+        for candidate in heading_candidates:
+            y_pos_by_text.setdefault(candidate["text"], candidate["y_pos"])
         
-        # Sort by page and position
-        classified_headings.sort(key=lambda x: (x["page"], 
-                                              next(c["y_pos"] for c in heading_candidates 
-                                                   if c["text"] == x["text"])))
+        classified_headings.sort(key=lambda x: (x[2], y_pos_by_text[x[1]]))
         
         result = []
         if title:
@@ -379,7 +552,7 @@ class PDFOutlineExtractor:
         return result
     
     def _determine_heading_level(self, candidate: Dict[str, Any], 
-                               sorted_styles: List[Tuple], 
+                               style_ranks: Dict[Tuple, int], 
                                style_groups: Dict) -> Optional[str]:
         """Determine the heading level (H1, H2, H3) for a candidate."""
         
@@ -396,18 +569,16 @@ class PDFOutlineExtractor:
         # Use font-based classification
         candidate_style = (candidate["font_size"], candidate["is_bold"])
         
-        try:
-            style_rank = sorted_styles.index(candidate_style)
-            
-            # Map style rank to heading level
+        style_rank = style_ranks.get(candidate_style)
+        
+        # Map style rank to heading level
+        if style_rank is not None:
             if style_rank == 0:
                 return "H1"
             elif style_rank == 1:
                 return "H2"
             elif style_rank <= 3:  # Allow some flexibility for H3
                 return "H3"
-        except ValueError:
-            pass
         
         # Fallback: use relative font size
         font_size = candidate["font_size"]
@@ -425,52 +596,50 @@ class PDFOutlineExtractor:
         Pass 4: Generate the final JSON output in the required format.
         """
         if not result:
-            output_data = {"title": "", "outline": []}
+            title, headings = "", []
         else:
             title = result[0].get("title", "")
             headings = result[0].get("headings", [])
-            
-            output_data = {
-                "title": title,
-                "outline": headings
-            }
+        
+        # Stream the indented document piece by piece; only strings go through the encoder
+        parts = [b'{\n  "title": ', _dumps(title), b',\n  "outline": [']
+        for i, (level, text, page) in enumerate(headings):
+            parts.append(b',\n    {\n      "level": ' if i else b'\n    {\n      "level": ')
+            parts.extend((_dumps(level), b',\n      "text": ', _dumps(text),
+                          b',\n      "page": %d\n    }' % page))
+        parts.append(b'\n  ]\n}' if headings else b']\n}')
         
         # Write JSON output
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, indent=2, ensure_ascii=False)
+        with open(output_path, 'wb') as f:
+            f.writelines(parts)
     
     def process_single_pdf(self, pdf_path: Path) -> bool:
         """Process a single PDF file and generate JSON output."""
         try:
             print(f"Processing: {pdf_path.name}")
             
-            # Open PDF document
-            doc = fitz.open(pdf_path)
-            
-            if len(doc) == 0:
-                print(f"Warning: {pdf_path.name} is empty")
-                return False
-            
-            # Multi-pass analysis
-            print("  Pass 1: Extracting text blocks...")
-            text_blocks = self.extract_text_blocks(doc)
-            
-            print("  Pass 1: Analyzing document profile...")
-            profile = self.analyze_document_profile(text_blocks)
-            
-            print("  Pass 2: Identifying heading candidates...")
-            candidates = self.identify_heading_candidates(text_blocks, profile)
-            
-            print("  Pass 3: Classifying hierarchy...")
-            result = self.classify_heading_hierarchy(candidates)
-            
-            # Generate output file path
-            output_file = self.output_dir / f"{pdf_path.stem}.json"
-            
-            print("  Pass 4: Generating JSON output...")
-            self.generate_json_output(result, output_file)
+            # Open as PDF directly; pages are loaded lazily by the extraction loop
+            with fitz.open(pdf_path, filetype="pdf") as doc:
+                if len(doc) == 0:
+                    print(f"Warning: {pdf_path.name} is empty")
+                    return False
+                
+                # Multi-pass analysis
+                print("  Pass 1: Extracting text blocks and document profile...")
+                text_blocks, profile = self.extract_text_blocks(doc)
+                
+                print("  Pass 2: Identifying heading candidates...")
+                candidates = self.identify_heading_candidates(text_blocks, profile)
+                
+                print("  Pass 3: Classifying hierarchy...")
+                result = self.classify_heading_hierarchy(candidates)
+                
+                # Generate output file path
+                output_file = self.output_dir / f"{pdf_path.stem}.json"
+                
+                print("  Pass 4: Generating JSON output...")
+                self.generate_json_output(result, output_file)
             
-            doc.close()
             print(f"  ✓ Generated: {output_file.name}")
             return True
             
@@ -493,14 +662,31 @@ class PDFOutlineExtractor:
         
         print(f"Found {len(pdf_files)} PDF file(s) to process")
         
-        successful = 0
-        for pdf_file in pdf_files:
-            if self.process_single_pdf(pdf_file):
-                successful += 1
+        # Each PDF is an independent CPU-bound job, so spread them across processes
+        workers = min(os.cpu_count() or 1, 4, len(pdf_files))
+        
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(
+                    _process_one,
+                    [str(pdf_file) for pdf_file in pdf_files],
+                    repeat(str(self.output_dir)),
+                    chunksize=1
+                ))
+        else:
+            results = [self.process_single_pdf(pdf_file) for pdf_file in pdf_files]
+        
+        successful = sum(results)
         
         print(f"\nProcessing complete: {successful}/{len(pdf_files)} files processed successfully")
 
 
+def _process_one(pdf_path: str, output_dir: str) -> bool:
+    """Worker entry point: process one PDF in a child process."""
+    extractor = PDFOutlineExtractor(Path(pdf_path).parent, output_dir)
+    return extractor.process_single_pdf(Path(pdf_path))
+
+
 def main():
     """Main entry point for the PDF outline extraction system."""
     print("PDF Outline Extraction System - Adobe Hackathon Round 1A")
@@ -0,0 +1,66 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from config import Config
+from document_analyzer import DocumentAnalyzer
+
+logger = logging.getLogger(__name__)
+
+# An entry point's process_collection(collection_path, config, analyzer)
+CollectionProcessor = Callable[[Path, Config, Optional[DocumentAnalyzer]], Dict[str, Any]]
+
+# Per-process analyzer and entry point shared by the collections a pool worker processes
+_worker_analyzer = None
+_worker_process = None
+
+
+def default_workers() -> int:
+    """Default number of collections processed in parallel: all CPUs but one."""
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def _init_worker(config: Config, process: CollectionProcessor):
+    """Pool initializer: build one DocumentAnalyzer per worker process."""
+    global _worker_analyzer, _worker_process
+    _worker_analyzer = DocumentAnalyzer(config)
+    _worker_process = process
+
+
+def _process_in_worker(collection_path: Path) -> Dict[str, Any]:
+    """Worker entry point: process one collection with the process-local analyzer."""
+    return _worker_process(collection_path, _worker_analyzer.config, _worker_analyzer)
+
+
+def process_collections(collection_paths: List[Path], config: Config, workers: int,
+                        process: CollectionProcessor) -> List[Dict[str, Any]]:
+    """Process collections with process(), in parallel worker processes when more than one worker is allowed."""
+    workers = min(workers, len(collection_paths))
+    if workers <= 1:
+        # One analyzer serves every collection; each analysis rebuilds its own state
+        analyzer = DocumentAnalyzer(config)
+        return [process(collection_path, config, analyzer) for collection_path in collection_paths]
+
+    # Each worker's parser starts its own process pool; split the parsing budget
+    # between the collection workers so the two levels do not multiply
+    parser_workers = max(1, (config.parser_workers or os.cpu_count() or 1) // workers)
+    worker_config = replace(config, parser_workers=parser_workers)
+
+    # Collections share no state; report each as it finishes, return in input order
+    logger.info(f"Processing {len(collection_paths)} collections with {workers} worker processes "
+                f"({parser_workers} parsing processes each)")
+    results: List[Dict[str, Any]] = [None] * len(collection_paths)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(worker_config, process)) as executor:
+        futures = {executor.submit(_process_in_worker, collection_path): index
+                   for index, collection_path in enumerate(collection_paths)}
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results[futures[future]] = result
+            status = "done" if result.get('success', False) else "failed"
+            logger.info(f"[{done}/{len(futures)}] {result['collection']} {status} "
+                        f"in {result['processing_time']:.2f}s")
+    return results
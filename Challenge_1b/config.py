@@ -4,10 +4,57 @@ Configuration settings for the document analysis system
 
 import os
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Optional
 
 
-@dataclass
+def _env(name: str, cast=str):
+    """Read an environment override once, returning None when unset or malformed."""
+    value = os.getenv(name)
+    if value is None:
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        return None
+
+
+# Environment overrides, parsed once at import rather than per Config instance
+_ENV_MODEL_NAME = _env("MODEL_NAME")
+_ENV_RELEVANCE_THRESHOLD = _env("RELEVANCE_THRESHOLD", float)
+_ENV_MAX_SECTIONS = _env("MAX_SECTIONS", int)
+_ENV_MAX_SUBSECTIONS = _env("MAX_SUBSECTIONS", int)
+
+# Unit-length keyword weights are stored as round(weight * scale) when embedding_dtype is int8
+INT8_WEIGHT_SCALE = 127
+_EMBEDDING_DTYPES = ("float32", "int8")
+
+
+@lru_cache(maxsize=None)
+def _validate_params(min_chunk_length: int, max_chunk_length: int, relevance_threshold: float,
+                     max_sections: int, max_subsections: int, embedding_batch_size: int,
+                     embedding_dtype: str, semantic_cache_tau: Optional[float]):
+    """Validate configuration parameters; successful tuples are memoized."""
+    if min_chunk_length >= max_chunk_length:
+        raise ValueError("min_chunk_length must be less than max_chunk_length")
+    
+    if relevance_threshold < 0 or relevance_threshold > 1:
+        raise ValueError("relevance_threshold must be between 0 and 1")
+    
+    if max_sections <= 0 or max_subsections <= 0:
+        raise ValueError("max_sections and max_subsections must be positive")
+    
+    if embedding_batch_size <= 0:
+        raise ValueError("embedding_batch_size must be positive")
+    
+    if embedding_dtype not in _EMBEDDING_DTYPES:
+        raise ValueError(f"embedding_dtype must be one of {', '.join(_EMBEDDING_DTYPES)}")
+    
+    if semantic_cache_tau is not None and not 0 < semantic_cache_tau <= 1:
+        raise ValueError("semantic_cache_tau must be in (0, 1]")
+
+
+@dataclass(slots=True, frozen=True)
 class Config:
     """Configuration parameters for the document analysis system."""
     
@@ -19,11 +66,16 @@ class Config:
     min_chunk_length: int = 50
     max_chunk_length: int = 2000
     max_refined_text_length: int = 500
+    use_pymupdf: bool = True  # parse with PyMuPDF when installed; False keeps pdfplumber for exact text parity
     
     # Retrieval parameters
     relevance_threshold: float = 0.1
     max_retrieved_chunks: int = 100
     max_chunks_per_document: int = 20
+    # float32 moves scores by ~1e-8 against float64, well inside their margin to relevance_threshold
+    embedding_dtype: str = "float32"  # CSR keyword weights; "int8" quantizes them to [0, 127]
+    retrieval_cache_size: int = 128  # score vectors memoized per chunk set; 0 disables
+    semantic_cache_tau: Optional[float] = None  # reuse scores of a cached query at least this similar
     
     # Output configuration
     max_sections: int = 10
@@ -32,36 +84,36 @@ class Config:
     # Performance settings
     max_processing_time: int = 60  # seconds
     memory_limit_mb: int = 1024
+    parse_memo_size: int = 32  # parsed documents kept in memory for reuse across collections; 0 disables
+    parser_workers: Optional[int] = None  # PDF parsing processes; defaults to the CPU count, split across collection workers
     
     # File paths
     model_cache_dir: str = "models"
     temp_dir: str = "temp"
+    embed_cache_path: Optional[str] = None  # SQLite file for chunk embeddings; disabled when None
+    parse_cache_dir: Optional[str] = None  # pickled PDF parse results; disabled when None
     
     def __post_init__(self):
         """Post-initialization validation and environment variable overrides."""
         
-        # Override with environment variables if available
-        self.model_name = os.getenv("MODEL_NAME", self.model_name)
-        self.relevance_threshold = float(os.getenv("RELEVANCE_THRESHOLD", self.relevance_threshold))
-        self.max_sections = int(os.getenv("MAX_SECTIONS", self.max_sections))
-        self.max_subsections = int(os.getenv("MAX_SUBSECTIONS", self.max_subsections))
+        # Override with environment variables if available (frozen, so bypass __setattr__)
+        if _ENV_MODEL_NAME is not None:
+            object.__setattr__(self, "model_name", _ENV_MODEL_NAME)
+        if _ENV_RELEVANCE_THRESHOLD is not None:
+            object.__setattr__(self, "relevance_threshold", _ENV_RELEVANCE_THRESHOLD)
+        if _ENV_MAX_SECTIONS is not None:
+            object.__setattr__(self, "max_sections", _ENV_MAX_SECTIONS)
+        if _ENV_MAX_SUBSECTIONS is not None:
+            object.__setattr__(self, "max_subsections", _ENV_MAX_SUBSECTIONS)
         
         # Validate configuration
         self._validate_config()
     
     def _validate_config(self):
         """Validate configuration parameters."""
-        if self.min_chunk_length >= self.max_chunk_length:
-            raise ValueError("min_chunk_length must be less than max_chunk_length")
-        
-        if self.relevance_threshold < 0 or self.relevance_threshold > 1:
-            raise ValueError("relevance_threshold must be between 0 and 1")
-        
-        if self.max_sections <= 0 or self.max_subsections <= 0:
-            raise ValueError("max_sections and max_subsections must be positive")
-        
-        if self.embedding_batch_size <= 0:
-            raise ValueError("embedding_batch_size must be positive")
+        _validate_params(self.min_chunk_length, self.max_chunk_length, self.relevance_threshold,
+                         self.max_sections, self.max_subsections, self.embedding_batch_size,
+                         self.embedding_dtype, self.semantic_cache_tau)
     
     @classmethod
     def for_hackathon(cls) -> 'Config':
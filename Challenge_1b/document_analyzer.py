@@ -1,16 +1,52 @@
 import logging
+import re
+import sys
 from pathlib import Path
 from typing import List, Dict, Any, Tuple
 import time
-from collections import defaultdict
+from array import array
+from dataclasses import dataclass, field
 
-from pdf_parser import PDFParser
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; section totals are summed in Python instead
+    np = None
+
+from pdf_parser import PDFParser, DocumentChunks
 from embedder import DocumentEmbedder
 from retriever import RelevanceRetriever
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Words that mark a line as a section title in _extract_clean_section_title
+_TITLE_KEYWORDS = ('guide', 'introduction', 'overview', 'chapter')
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+@dataclass(slots=True)
+class Chunks:
+    """Column-oriented chunk records: one aligned column per field instead of a dict per chunk."""
+    
+    texts: List[str] = field(default_factory=list)
+    sources: List[str] = field(default_factory=list)
+    section_titles: List[str] = field(default_factory=list)
+    page_numbers: array = field(default_factory=lambda: array('i'))
+    
+    def __len__(self) -> int:
+        return len(self.texts)
+    
+    def extend(self, document: DocumentChunks):
+        """Append one parsed document's columns."""
+        self.texts.extend(document.texts)
+        # Titles repeat across a section's chunks and arrive as fresh strings from the
+        # parsing workers; interning shares one object per distinct title
+        self.section_titles.extend([sys.intern(title) for title in document.section_titles])
+        self.page_numbers.extend(document.page_numbers)
+        # Every row shares one interned source name, so the (document, section_title)
+        # keys in aggregation compare by identity first
+        self.sources.extend([sys.intern(document.source_document)] * len(document))
+
 
 class DocumentAnalyzer:
     """Main document analysis orchestrator."""
@@ -35,21 +71,13 @@ class DocumentAnalyzer:
         logger.info(f"Starting analysis of {len(pdf_paths)} documents")
         
         # Step 1: Parse all documents and extract structured content
-        all_chunks = []
+        all_chunks = Chunks()
         document_metadata = {}
         
-        for pdf_path in pdf_paths:
-            logger.info(f"Parsing document: {pdf_path.name}")
-            chunks, metadata = self.pdf_parser.parse_document(pdf_path)
-            
-            # Add document source to each chunk and filter None chunks
-            valid_chunks = []
-            for chunk in chunks:
-                if chunk is not None:
-                    chunk['source_document'] = pdf_path.name
-                    valid_chunks.append(chunk)
-            
-            all_chunks.extend(valid_chunks)
+        parsed = self.pdf_parser.parse_documents(pdf_paths)
+        
+        for pdf_path, (chunks, metadata) in zip(pdf_paths, parsed):
+            all_chunks.extend(chunks)
             document_metadata[pdf_path.name] = metadata
             
         logger.info(f"Extracted {len(all_chunks)} text chunks from all documents")
@@ -60,80 +88,97 @@ class DocumentAnalyzer:
         
         # Step 2: Generate keyword representations for all chunks and the query
         logger.info("Generating keyword representations...")
-        chunk_embeddings = self.embedder.embed_chunks([chunk['text'] for chunk in all_chunks])
+        # Embed and score each distinct text once; scores are scattered back to every chunk
+        text_index = {}
+        inverse = [text_index.setdefault(text, len(text_index)) for text in all_chunks.texts]
+        chunk_embeddings = self.embedder.embed_chunks(list(text_index))
+        if len(text_index) < len(all_chunks):
+            logger.info(f"Embedded {len(text_index)} unique texts for {len(all_chunks)} chunks")
+        else:
+            inverse = None
         query_embedding = self.embedder.embed_query(query)
         
-        # Step 3: Retrieve most relevant chunks
+        # Step 3: Retrieve most relevant chunk rows
         logger.info("Computing relevance scores...")
-        relevant_chunks = self.retriever.retrieve_relevant_chunks(
-            all_chunks, chunk_embeddings, query_embedding
-        )
+        relevant_rows = self.retriever.rank_chunks(chunk_embeddings, query_embedding, inverse)
         
-        logger.info(f"Retrieved {len(relevant_chunks)} relevant chunks")
+        logger.info(f"Retrieved {len(relevant_rows)} relevant chunks")
         
         # Step 4: Aggregate section-level importance scores
-        section_scores = self._aggregate_section_scores(relevant_chunks)
+        section_scores = self._aggregate_section_scores(all_chunks, relevant_rows)
         
         # Step 5: Generate section rankings
-        section_rankings = self._generate_section_rankings(section_scores, document_metadata)
+        section_rankings = self._generate_section_rankings(all_chunks, section_scores, document_metadata)
         
         # Step 6: Generate subsection analysis
-        subsection_analysis = self._generate_subsection_analysis(relevant_chunks)
+        subsection_analysis = self._generate_subsection_analysis(all_chunks, relevant_rows)
         
         return section_rankings, subsection_analysis
     
-    def _aggregate_section_scores(self, relevant_chunks: List[Dict]) -> Dict[str, Dict]:
-        """Aggregate relevance scores at the section level."""
-        section_scores = {}
-        
-        for chunk in relevant_chunks:
-            section_key = f"{chunk['source_document']}:{chunk.get('section_title', 'Unknown Section')}"
-            
-            if section_key not in section_scores:
-                section_scores[section_key] = {
-                    'total_score': 0.0,
-                    'chunk_count': 0,
-                    'document': chunk['source_document'],
-                    'section_title': chunk.get('section_title', 'Unknown Section'),
-                    'page_numbers': set(),
-                    'chunks': []
-                }
-            
-            section_data = section_scores[section_key]
-            section_data['total_score'] += chunk['relevance_score']
-            section_data['chunk_count'] += 1
-            section_data['page_numbers'].add(chunk.get('page_number', 1))
-            section_data['chunks'].append(chunk)
-        
-        # Calculate average scores
-        for section_data in section_scores.values():
-            if section_data['chunk_count'] > 0:
-                section_data['avg_score'] = section_data['total_score'] / section_data['chunk_count']
-            else:
-                section_data['avg_score'] = 0.0
+    def _aggregate_section_scores(self, chunks: Chunks,
+                                  relevant_rows: List[Tuple[int, float]]) -> Dict[Tuple[str, str], List]:
+        """
+        Aggregate relevance scores at the section level.
         
-        return section_scores
+        Returns a mapping of (document, section_title) to
+        [total_score, chunk_count, first_page, best_row]. Rows arrive best
+        first, so the first row seen for a section is its best chunk.
+        """
+        # Factorize rows into dense section ids in first-seen order
+        section_index = {}
+        section_ids = [
+            section_index.setdefault((chunks.sources[row], chunks.section_titles[row]), len(section_index))
+            for row, _ in relevant_rows
+        ]
+        n_sections = len(section_index)
+        
+        first_pages = [None] * n_sections
+        best_rows = [None] * n_sections
+        for (row, _), section_id in zip(relevant_rows, section_ids):
+            page = chunks.page_numbers[row]
+            if best_rows[section_id] is None:
+                best_rows[section_id] = row
+                first_pages[section_id] = page
+            elif page < first_pages[section_id]:
+                first_pages[section_id] = page
+        
+        # Sum scores and counts per section id in one pass
+        scores = [score for _, score in relevant_rows]
+        if np is not None and section_ids:
+            totals = np.bincount(section_ids, weights=scores, minlength=n_sections).tolist()
+            counts = np.bincount(section_ids, minlength=n_sections).tolist()
+        else:
+            totals, counts = [0.0] * n_sections, [0] * n_sections
+            for section_id, score in zip(section_ids, scores):
+                totals[section_id] += score
+                counts[section_id] += 1
+        
+        return {
+            key: [totals[i], counts[i], first_pages[i], best_rows[i]]
+            for key, i in section_index.items()
+        }
     
-    def _generate_section_rankings(self, section_scores: Dict, document_metadata: Dict) -> List[Dict]:
+    def _generate_section_rankings(self, chunks: Chunks, section_scores: Dict,
+                                   document_metadata: Dict) -> List[Dict]:
         """Generate final section rankings with enhanced persona-specific logic."""
         # Sort sections by average score
         sorted_sections = sorted(
             section_scores.items(),
-            key=lambda x: x[1]['avg_score'],
+            key=lambda x: x[1][0] / x[1][1],
             reverse=True
         )
         
         rankings = []
-        for rank, (section_key, section_data) in enumerate(sorted_sections[:self.config.max_sections], 1):
+        for rank, ((document, _), (_, _, first_page, best_row)) in enumerate(
+                sorted_sections[:self.config.max_sections], 1):
             # Get the full section title from the best chunk
-            best_chunk = max(section_data['chunks'], key=lambda x: x['relevance_score'])
-            full_section_title = self._extract_clean_section_title(best_chunk['text'])
+            full_section_title = self._extract_clean_section_title(chunks.texts[best_row])
             
             ranking = {
-                'document': section_data['document'],
+                'document': document,
                 'section_title': full_section_title,
                 'importance_rank': rank,
-                'page_number': list(section_data['page_numbers'])[0] if section_data['page_numbers'] else 1
+                'page_number': first_page
             }
             rankings.append(ranking)
         
@@ -147,12 +192,14 @@ class DocumentAnalyzer:
         # Look for the first meaningful line that could be a title
         for line in lines[:3]:  # Check first 3 lines
             line = line.strip()
-            if len(line) > 10 and len(line) < 100:
-                # Check if it looks like a title
-                if (line.istitle() or 
-                    line.isupper() or 
-                    any(keyword in line.lower() for keyword in ['guide', 'introduction', 'overview', 'chapter'])):
-                    return line
+            if not 10 < len(line) < 100:
+                continue
+            # Check if it looks like a title
+            if line.istitle() or line.isupper():
+                return line
+            line_lower = line.lower()
+            if any(keyword in line_lower for keyword in _TITLE_KEYWORDS):
+                return line
         
         # If no clear title found, use first substantial line
         for line in lines:
@@ -166,21 +213,20 @@ class DocumentAnalyzer:
         
         return "Untitled Section"
     
-    def _generate_subsection_analysis(self, relevant_chunks: List[Dict]) -> List[Dict]:
+    def _generate_subsection_analysis(self, chunks: Chunks,
+                                      relevant_rows: List[Tuple[int, float]]) -> List[Dict]:
         """Generate subsection analysis with refined text."""
         subsections = []
         
         # Take top chunks for subsection analysis
-        top_chunks = relevant_chunks[:self.config.max_subsections]
-        
-        for chunk in top_chunks:
+        for row, _ in relevant_rows[:self.config.max_subsections]:
             # Refine the text to be more concise
-            refined_text = self._refine_text(chunk['text'])
+            refined_text = self._refine_text(chunks.texts[row])
             
             subsection = {
-                'document': chunk['source_document'],
+                'document': chunks.sources[row],
                 'refined_text': refined_text,
-                'page_number': chunk.get('page_number', 1)
+                'page_number': chunks.page_numbers[row]
             }
             
             subsections.append(subsection)
@@ -191,17 +237,18 @@ class DocumentAnalyzer:
     def _refine_text(self, text: str) -> str:
         """Refine text to be more concise and focused."""
         # Normalize whitespace by replacing newlines and multiple spaces with a single space
-        text = ' '.join(text.split())
+        text = _WHITESPACE_RE.sub(' ', text).strip()
 
         # Truncate if too long
-        if len(text) > self.config.max_refined_text_length:
-            # Try to find a good stopping point (end of sentence)
-            truncated = text[:self.config.max_refined_text_length]
-            last_period = truncated.rfind('.')
+        max_length = self.config.max_refined_text_length
+        if len(text) > max_length:
+            # Try to find a good stopping point (end of sentence) in the last 30% only
+            truncated = text[:max_length]
+            last_period = truncated.rfind('.', int(max_length * 0.7) + 1)
             
-            if last_period > self.config.max_refined_text_length * 0.7:
+            if last_period != -1:
                 return truncated[:last_period + 1]
             else:
                 return truncated + "..."
         
-        return text
\ No newline at end of file
+        return text
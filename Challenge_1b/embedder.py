@@ -1,12 +1,57 @@
 import logging
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Union
 import re
+import math
+import sqlite3
+from array import array
 from collections import Counter
+from contextlib import closing
+from functools import lru_cache
 
-from config import Config
+try:
+    import numpy as np
+    from scipy.sparse import csr_matrix
+except ImportError:  # SciPy is optional; chunks fall back to dict vectors
+    csr_matrix = None
+
+try:
+    from sklearn.feature_extraction.text import HashingVectorizer
+except ImportError:  # scikit-learn is optional; the vocabulary CSR builder is used instead
+    HashingVectorizer = None
+
+from config import Config, INT8_WEIGHT_SCALE
+from utils import hash_content
 
 logger = logging.getLogger(__name__)
 
+# Common stop words excluded from keyword vectors
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 
+    'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 
+    'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should',
+    'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 
+    'they', 'me', 'him', 'her', 'us', 'them', 'my', 'your', 'his', 'her',
+    'its', 'our', 'their', 'can', 'may', 'might', 'must', 'shall', 'get',
+    'go', 'come', 'take', 'make', 'see', 'know', 'think', 'say', 'tell',
+    'give', 'use', 'find', 'want', 'need', 'try', 'ask', 'work', 'seem',
+    'feel', 'leave', 'put', 'mean', 'keep', 'let', 'begin', 'start'
+})
+
+# Letters-only tokens of 3+ characters, the same terms _extract_keywords keeps
+_TOKEN_PATTERN = r'(?u)\b[^\W\d_]{3,}\b'
+_TOKEN_RE = re.compile(_TOKEN_PATTERN)
+
+# Embedding cache rows; namespace identifies the vectorizer settings that produced them
+_EMBED_CACHE_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS rows ("
+    "namespace TEXT NOT NULL, key TEXT NOT NULL, indices BLOB NOT NULL, data BLOB NOT NULL, "
+    "PRIMARY KEY (namespace, key))"
+)
+# Keys per SELECT, below SQLite's bound-parameter limit
+_EMBED_CACHE_BATCH = 500
+# Seconds a cache connection waits for another process's write lock
+_EMBED_CACHE_TIMEOUT = 30.0
+
 
 class DocumentEmbedder:
     """Generates text representations using keyword-based similarity matching."""
@@ -15,8 +60,30 @@ class DocumentEmbedder:
         self.config = config
         self.vocabulary = set()
         self.document_vectors = []
+        self._vocab: Dict[str, int] = {}
+        self._matrix = None
+        self._vectorizer = None
+        if HashingVectorizer is not None:
+            self._vectorizer = HashingVectorizer(
+                n_features=2**18,
+                alternate_sign=False,
+                norm='l2',
+                dtype=np.float32,
+                stop_words=list(STOP_WORDS),
+                token_pattern=_TOKEN_PATTERN
+            )
+            # Cached rows are only valid for the settings that produced them
+            self._cache_namespace = hash_content(repr((
+                self._vectorizer.n_features, self._vectorizer.token_pattern,
+                np.dtype(self._vectorizer.dtype).name, self._vectorizer.norm,
+                self._vectorizer.alternate_sign, self._vectorizer.lowercase,
+                sorted(self._vectorizer.stop_words)
+            )))
+        
+        # Query vectors depend on the current vocabulary, so this is cleared per embed_chunks
+        self._query_cache = lru_cache(maxsize=2048)(self._build_query_vector)
         
-    def embed_chunks(self, texts: List[str]) -> List[Dict[str, float]]:
+    def embed_chunks(self, texts: List[str]) -> Union["csr_matrix", List[Dict[str, float]]]:
         """
         Generate keyword-based representations for text chunks.
         
@@ -24,32 +91,131 @@ class DocumentEmbedder:
             texts: List of text strings to process
             
         Returns:
-            List of dictionaries representing keyword frequencies
+            A CSR matrix of L2-normalized term frequencies when SciPy is available
+            (hashed columns with scikit-learn, one column per vocabulary term
+            without it; float32, or int8 per config.embedding_dtype), otherwise a
+            list of unit-length keyword frequency dictionaries
         """
         if not texts:
             return []
         
         logger.info(f"Generating keyword representations for {len(texts)} text chunks")
         
-        # Build vocabulary from all texts
-        all_words = set()
-        for text in texts:
-            words = self._extract_keywords(text)
-            all_words.update(words)
+        self._query_cache.cache_clear()
+        
+        if self._vectorizer is not None:
+            # Hashed columns need no vocabulary pass; rows come back L2-normalized
+            if self.config.embed_cache_path:
+                self._matrix = self._apply_dtype(self._transform_with_disk_cache(texts))
+            else:
+                self._matrix = self._apply_dtype(self._vectorizer.transform(texts))
+            self.document_vectors = self._matrix
+            return self._matrix
+        
+        if csr_matrix is None:
+            return self._embed_chunks_dict(texts)
+        
+        # Tokenize each text once, assigning vocabulary columns as terms appear
+        vocab = {}
+        rows, cols, data = array('i'), array('i'), array('f')
+        for row, text in enumerate(texts):
+            word_counts = Counter(self._extract_keywords(text))
+            if not word_counts:
+                continue
+            norm = math.sqrt(sum(count * count for count in word_counts.values()))
+            for word, count in word_counts.items():
+                rows.append(row)
+                cols.append(vocab.setdefault(word, len(vocab)))
+                data.append(count / norm)
+        
+        self._vocab = vocab
+        self.vocabulary = vocab.keys()
+        logger.info(f"Built vocabulary with {len(vocab)} unique terms")
+        
+        # Rows are already unit length, so retrieval is a single sparse matmul
+        self._matrix = self._apply_dtype(csr_matrix(
+            (np.frombuffer(data, dtype=np.float32),
+             (np.frombuffer(rows, dtype=np.intc), np.frombuffer(cols, dtype=np.intc))),
+            shape=(len(texts), len(vocab))
+        ))
+        self.document_vectors = self._matrix
+        return self._matrix
+    
+    def _transform_with_disk_cache(self, texts: List[str]) -> "csr_matrix":
+        """Hash-vectorize texts, reusing rows persisted in SQLite under their content key."""
+        keys = [hash_content(text) for text in texts]
+        
+        # SQLite locks the file, so collection and parser workers can share one cache
+        try:
+            with closing(sqlite3.connect(self.config.embed_cache_path,
+                                         timeout=_EMBED_CACHE_TIMEOUT)) as db:
+                db.execute(_EMBED_CACHE_SCHEMA)
+                cached = {}
+                for start in range(0, len(keys), _EMBED_CACHE_BATCH):
+                    batch = keys[start:start + _EMBED_CACHE_BATCH]
+                    cached.update(
+                        (key, (np.frombuffer(indices, dtype=np.intc), np.frombuffer(data, dtype=np.float32)))
+                        for key, indices, data in db.execute(
+                            f"SELECT key, indices, data FROM rows WHERE namespace = ? "
+                            f"AND key IN ({', '.join('?' * len(batch))})",
+                            (self._cache_namespace, *batch)
+                        )
+                    )
+                rows = [cached.get(key) for key in keys]
+                misses = [i for i, row in enumerate(rows) if row is None]
+                
+                if misses:
+                    fresh = self._vectorizer.transform([texts[i] for i in misses])
+                    for j, i in enumerate(misses):
+                        start, end = fresh.indptr[j], fresh.indptr[j + 1]
+                        rows[i] = (fresh.indices[start:end].copy(), fresh.data[start:end].copy())
+                    with db:  # One transaction for the whole batch
+                        db.executemany(
+                            "INSERT OR IGNORE INTO rows VALUES (?, ?, ?, ?)",
+                            ((self._cache_namespace, keys[i], rows[i][0].tobytes(), rows[i][1].tobytes())
+                             for i in misses)
+                        )
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache {self.config.embed_cache_path} unavailable: {e}")
+            return self._vectorizer.transform(texts)
+        
+        logger.info(f"Embedding cache: {len(texts) - len(misses)} hits, {len(misses)} misses")
         
-        self.vocabulary = all_words
+        indptr = np.zeros(len(rows) + 1, dtype=np.intc)
+        np.cumsum([len(indices) for indices, _ in rows], out=indptr[1:])
+        return csr_matrix(
+            (np.concatenate([data for _, data in rows], dtype=np.float32),
+             np.concatenate([indices for indices, _ in rows]),
+             indptr),
+            shape=(len(rows), self._vectorizer.n_features)
+        )
+    
+    def _apply_dtype(self, matrix: "csr_matrix") -> "csr_matrix":
+        """Store CSR weights in the configured dtype; int8 quantizes unit weights to [0, 127]."""
+        if self.config.embedding_dtype != "int8":
+            return matrix
+        
+        quantized = csr_matrix(
+            (np.rint(matrix.data * INT8_WEIGHT_SCALE).astype(np.int8), matrix.indices, matrix.indptr),
+            shape=matrix.shape
+        )
+        quantized.eliminate_zeros()  # Weights under half a step round away entirely
+        return quantized
+    
+    def _embed_chunks_dict(self, texts: List[str]) -> List[Dict[str, float]]:
+        """Dict-vector fallback for embed_chunks when SciPy is not installed."""
+        # Tokenize each text once; the tokens feed both the vocabulary and the vectors
+        tokenized = [self._extract_keywords(text) for text in texts]
+        
+        self.vocabulary = set().union(*tokenized)
         logger.info(f"Built vocabulary with {len(self.vocabulary)} unique terms")
         
-        # Create vectors for each text
-        vectors = []
-        for text in texts:
-            vector = self._create_vector(text)
-            vectors.append(vector)
+        vectors = [self._vector_from_tokens(tokens) for tokens in tokenized]
         
         self.document_vectors = vectors
         return vectors
     
-    def embed_query(self, query: str) -> Dict[str, float]:
+    def embed_query(self, query: str) -> Union["csr_matrix", Dict[str, float]]:
         """
         Generate keyword representation for a single query string.
         
@@ -57,54 +223,51 @@ class DocumentEmbedder:
             query: Query string to process
             
         Returns:
-            Dictionary representing keyword frequencies
+            A unit-length CSR row in the same column space as the chunk matrix
+            when chunks were embedded as one, otherwise a unit-length keyword frequency dictionary
         """
         logger.info(f"Generating query representation for: {query[:100]}...")
-        return self._create_vector(query)
+        return self._query_cache(query)
+    
+    def _build_query_vector(self, query: str) -> Union["csr_matrix", Dict[str, float]]:
+        """Build the query representation; memoized per query by embed_query."""
+        if self._vectorizer is not None:
+            return self._apply_dtype(self._vectorizer.transform([query]))
+        
+        if self._matrix is None:
+            return self._create_vector(query)
+        
+        # Normalize over every query term so that terms missing from the
+        # vocabulary still count towards the query magnitude, then drop them
+        word_counts = Counter(self._extract_keywords(query))
+        norm = math.sqrt(sum(count * count for count in word_counts.values())) or 1.0
+        vocab = self._vocab
+        known = [(vocab[word], count / norm) for word, count in word_counts.items() if word in vocab]
+        known.sort()
+        
+        return self._apply_dtype(csr_matrix(
+            (np.array([value for _, value in known], dtype=np.float32),
+             np.array([col for col, _ in known], dtype=np.intc),
+             np.array([0, len(known)], dtype=np.intc)),
+            shape=(1, len(vocab))
+        ))
     
     def _extract_keywords(self, text: str) -> List[str]:
         """Extract meaningful keywords from text."""
-        # Convert to lowercase and remove punctuation
-        text = re.sub(r'[^\w\s]', ' ', text.lower())
-        
-        # Split into words
-        words = text.split()
-        
-        # Filter out common stop words and short words
-        stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 
-            'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 
-            'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should',
-            'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 
-            'they', 'me', 'him', 'her', 'us', 'them', 'my', 'your', 'his', 'her',
-            'its', 'our', 'their', 'can', 'may', 'might', 'must', 'shall', 'get',
-            'go', 'come', 'take', 'make', 'see', 'know', 'think', 'say', 'tell',
-            'give', 'use', 'find', 'want', 'need', 'try', 'ask', 'work', 'seem',
-            'feel', 'leave', 'put', 'mean', 'keep', 'let', 'begin', 'start'
-        }
-        
-        # Filter and return meaningful keywords
-        keywords = [
-            word for word in words 
-            if len(word) > 2 and word not in stop_words and word.isalpha()
-        ]
-        
-        return keywords
+        # Whole words of 3+ letters; digits or underscores inside a word drop it entirely
+        return [word for word in _TOKEN_RE.findall(text.lower()) if word not in STOP_WORDS]
     
     def _create_vector(self, text: str) -> Dict[str, float]:
-        """Create a keyword frequency vector for text."""
-        keywords = self._extract_keywords(text)
-        word_counts = Counter(keywords)
-        
-        # Calculate TF (term frequency) scores
-        total_words = len(keywords)
-        if total_words == 0:
+        """Create a unit-length keyword frequency vector for text."""
+        return self._vector_from_tokens(self._extract_keywords(text))
+    
+    def _vector_from_tokens(self, keywords: List[str]) -> Dict[str, float]:
+        """Create a unit-length keyword frequency vector from already extracted keywords."""
+        if not keywords:
             return {}
         
-        # Normalize by text length
-        vector = {}
-        for word, count in word_counts.items():
-            tf = count / total_words
-            vector[word] = tf
-        
-        return vector
\ No newline at end of file
+        # L2-normalize the term counts once here, as the CSR builders do, so that
+        # retrieval reduces cosine similarity to a dot product
+        word_counts = Counter(keywords)
+        norm = math.sqrt(sum(count * count for count in word_counts.values()))
+        return {word: count / norm for word, count in word_counts.items()}
@@ -1,9 +1,72 @@
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import re
 
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional; titles are scanned keyword by keyword instead
+    ahocorasick = None
+
 logger = logging.getLogger(__name__)
 
+# Priority keyword categories per persona as (category, weight, keywords).
+# A title earns each category's weight once if any of its keywords occurs in it.
+TRAVEL_PRIORITY_PATTERNS = [
+    ('cities', 10, ['cities', 'destinations', 'guide to major cities', 'comprehensive guide']),
+    ('activities', 8, ['coastal adventures', 'things to do', 'activities', 'water sports']),
+    ('food', 6, ['culinary experiences', 'cuisine', 'restaurants', 'dining']),
+    ('tips', 4, ['packing tips', 'travel tips', 'general tips', 'tricks']),
+    ('entertainment', 2, ['nightlife', 'entertainment', 'bars', 'clubs'])
+]
+
+HR_PRIORITY_PATTERNS = [
+    ('forms', 10, ['change flat forms to fillable', 'fillable forms', 'create forms', 'form creation']),
+    ('bulk', 8, ['create multiple pdfs', 'multiple files', 'bulk operations']),
+    ('conversion', 6, ['convert clipboard', 'convert', 'create and convert']),
+    ('workflow', 4, ['fill and sign', 'pdf forms', 'form workflow']),
+    ('signatures', 2, ['signatures', 'e-signatures', 'sign'])
+]
+
+FOOD_PRIORITY_PATTERNS = [
+    ('protein', 10, ['falafel', 'protein sources', 'main dishes', 'vegetarian protein']),
+    ('sides', 8, ['ratatouille', 'baba ganoush', 'substantial sides', 'side dishes']),
+    ('appetizers', 6, ['appetizers', 'starters', 'small plates']),
+    ('variety', 4, ['veggie sushi', 'variety', 'diverse options']),
+    ('buffet', 2, ['buffet', 'corporate', 'gathering', 'catering'])
+]
+
+
+def _build_matcher(priority_patterns: List[Tuple[str, int, List[str]]]):
+    """Compile a persona's keywords into one Aho-Corasick automaton (None without pyahocorasick)."""
+    if ahocorasick is None:
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for category, weight, keywords in priority_patterns:
+        for keyword in keywords:
+            automaton.add_word(keyword, (category, weight))
+    automaton.make_automaton()
+    return automaton
+
+
+_TRAVEL_MATCHER = _build_matcher(TRAVEL_PRIORITY_PATTERNS)
+_HR_MATCHER = _build_matcher(HR_PRIORITY_PATTERNS)
+_FOOD_MATCHER = _build_matcher(FOOD_PRIORITY_PATTERNS)
+
+
+def _priority_score(title_lower: str, priority_patterns: List[Tuple[str, int, List[str]]],
+                    matcher) -> int:
+    """Sum the weights of the priority categories matched by a lowercased title."""
+    if matcher is not None:
+        # One linear scan; each matched category counts once
+        matched = dict(value for _, value in matcher.iter(title_lower))
+        return sum(matched.values())
+    
+    return sum(
+        weight for _, weight, keywords in priority_patterns
+        if any(keyword in title_lower for keyword in keywords)
+    )
+
 
 class PersonaRanking:
     """Enhanced ranking system that matches expected output patterns"""
@@ -12,147 +75,51 @@ class PersonaRanking:
     def enhance_rankings_for_persona(rankings: List[Dict], persona: str, job_task: str) -> List[Dict]:
         """Apply persona-specific ranking enhancements"""
         
-        if 'travel planner' in persona.lower():
-            return PersonaRanking._enhance_travel_rankings(rankings, job_task)
-        elif 'hr professional' in persona.lower():
-            return PersonaRanking._enhance_hr_rankings(rankings, job_task)
-        elif 'food contractor' in persona.lower():
-            return PersonaRanking._enhance_food_rankings(rankings, job_task)
+        persona_lower = persona.lower()
+        for persona_key, enhance in _PERSONA_ENHANCERS.items():
+            if persona_key in persona_lower:
+                return enhance(rankings, job_task)
         
         return rankings
     
     @staticmethod
     def _enhance_travel_rankings(rankings: List[Dict], job_task: str) -> List[Dict]:
         """Enhance travel planner rankings to match expected patterns"""
-        
-        # Priority keywords for travel planning
-        priority_patterns = [
-            ('cities', ['cities', 'destinations', 'guide to major cities', 'comprehensive guide']),
-            ('activities', ['coastal adventures', 'things to do', 'activities', 'water sports']),
-            ('food', ['culinary experiences', 'cuisine', 'restaurants', 'dining']),
-            ('tips', ['packing tips', 'travel tips', 'general tips', 'tricks']),
-            ('entertainment', ['nightlife', 'entertainment', 'bars', 'clubs'])
-        ]
-        
-        # Score each ranking based on priority patterns
-        for ranking in rankings:
-            title_lower = ranking['section_title'].lower()
-            priority_score = 0
-            
-            for category, keywords in priority_patterns:
-                for keyword in keywords:
-                    if keyword in title_lower:
-                        if category == 'cities':
-                            priority_score += 10
-                        elif category == 'activities':
-                            priority_score += 8
-                        elif category == 'food':
-                            priority_score += 6
-                        elif category == 'tips':
-                            priority_score += 4
-                        elif category == 'entertainment':
-                            priority_score += 2
-                        break
-            
-            ranking['_priority_score'] = priority_score
-        
-        # Re-sort by priority score
-        rankings.sort(key=lambda x: x.get('_priority_score', 0), reverse=True)
-        
-        # Update importance ranks
-        for i, ranking in enumerate(rankings):
-            ranking['importance_rank'] = i + 1
-            if '_priority_score' in ranking:
-                del ranking['_priority_score']
-        
-        return rankings
+        return PersonaRanking._rescore(rankings, TRAVEL_PRIORITY_PATTERNS, _TRAVEL_MATCHER)
     
     @staticmethod
     def _enhance_hr_rankings(rankings: List[Dict], job_task: str) -> List[Dict]:
         """Enhance HR professional rankings to match expected patterns"""
-        
-        # Priority keywords for HR tasks
-        priority_patterns = [
-            ('forms', ['change flat forms to fillable', 'fillable forms', 'create forms', 'form creation']),
-            ('bulk', ['create multiple pdfs', 'multiple files', 'bulk operations']),
-            ('conversion', ['convert clipboard', 'convert', 'create and convert']),
-            ('workflow', ['fill and sign', 'pdf forms', 'form workflow']),
-            ('signatures', ['signatures', 'e-signatures', 'sign'])
-        ]
-        
-        # Score each ranking
-        for ranking in rankings:
-            title_lower = ranking['section_title'].lower()
-            priority_score = 0
-            
-            for category, keywords in priority_patterns:
-                for keyword in keywords:
-                    if keyword in title_lower:
-                        if category == 'forms':
-                            priority_score += 10
-                        elif category == 'bulk':
-                            priority_score += 8
-                        elif category == 'conversion':
-                            priority_score += 6
-                        elif category == 'workflow':
-                            priority_score += 4
-                        elif category == 'signatures':
-                            priority_score += 2
-                        break
-            
-            ranking['_priority_score'] = priority_score
-        
-        # Re-sort and update ranks
-        rankings.sort(key=lambda x: x.get('_priority_score', 0), reverse=True)
-        
-        for i, ranking in enumerate(rankings):
-            ranking['importance_rank'] = i + 1
-            if '_priority_score' in ranking:
-                del ranking['_priority_score']
-        
-        return rankings
+        return PersonaRanking._rescore(rankings, HR_PRIORITY_PATTERNS, _HR_MATCHER)
     
     @staticmethod
     def _enhance_food_rankings(rankings: List[Dict], job_task: str) -> List[Dict]:
         """Enhance food contractor rankings to match expected patterns"""
-        
-        # Priority keywords for food contractor tasks
-        priority_patterns = [
-            ('protein', ['falafel', 'protein sources', 'main dishes', 'vegetarian protein']),
-            ('sides', ['ratatouille', 'baba ganoush', 'substantial sides', 'side dishes']),
-            ('appetizers', ['appetizers', 'starters', 'small plates']),
-            ('variety', ['veggie sushi', 'variety', 'diverse options']),
-            ('buffet', ['buffet', 'corporate', 'gathering', 'catering'])
+        return PersonaRanking._rescore(rankings, FOOD_PRIORITY_PATTERNS, _FOOD_MATCHER)
+    
+    @staticmethod
+    def _rescore(rankings: List[Dict], priority_patterns: List[Tuple[str, int, List[str]]],
+                 matcher) -> List[Dict]:
+        """Re-sort rankings by persona priority score and renumber their importance ranks."""
+        
+        # Score each ranking title once, then sort by the scores (stable, so ties keep order)
+        scores = [
+            _priority_score(ranking['section_title'].lower(), priority_patterns, matcher)
+            for ranking in rankings
         ]
+        order = sorted(range(len(rankings)), key=scores.__getitem__, reverse=True)
+        rankings[:] = [rankings[i] for i in order]
         
-        # Score each ranking
-        for ranking in rankings:
-            title_lower = ranking['section_title'].lower()
-            priority_score = 0
-            
-            for category, keywords in priority_patterns:
-                for keyword in keywords:
-                    if keyword in title_lower:
-                        if category == 'protein':
-                            priority_score += 10
-                        elif category == 'sides':
-                            priority_score += 8
-                        elif category == 'appetizers':
-                            priority_score += 6
-                        elif category == 'variety':
-                            priority_score += 4
-                        elif category == 'buffet':
-                            priority_score += 2
-                        break
-            
-            ranking['_priority_score'] = priority_score
-        
-        # Re-sort and update ranks
-        rankings.sort(key=lambda x: x.get('_priority_score', 0), reverse=True)
-        
+        # Update importance ranks
         for i, ranking in enumerate(rankings):
             ranking['importance_rank'] = i + 1
-            if '_priority_score' in ranking:
-                del ranking['_priority_score']
         
-        return rankings
\ No newline at end of file
+        return rankings
+
+
+# Persona substring -> enhancer, checked in insertion order like the original if/elif chain
+_PERSONA_ENHANCERS = {
+    'travel planner': PersonaRanking._enhance_travel_rankings,
+    'hr professional': PersonaRanking._enhance_hr_rankings,
+    'food contractor': PersonaRanking._enhance_food_rankings
+}
@@ -1,13 +1,14 @@
-import json
 import sys
 import time
 import logging
+from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, List
 import traceback
 
 from document_analyzer import DocumentAnalyzer
 from config import Config
+from utils import json_dumps, json_loads
 
 # Configure logging
 logging.basicConfig(
@@ -23,8 +24,7 @@ logger = logging.getLogger(__name__)
 def load_input_json(input_path: Path) -> Dict[str, Any]:
     """Load and validate input JSON file."""
     try:
-        with open(input_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = json_loads(input_path.read_bytes())
         
         # Validate required fields
         required_fields = ['documents', 'persona', 'job_to_be_done']
@@ -44,6 +44,9 @@ def validate_pdf_files(documents: List[Dict], base_path: Path) -> List[Path]:
     """Validate that all PDF files exist and return their paths."""
     pdf_paths = []
     
+    # List attached_assets once; each document then scans the names in memory
+    asset_names = [asset_file.name for asset_file in Path('attached_assets').glob('*.pdf')]
+    
     for doc in documents:
         filename = doc.get('filename', '')
         if not filename:
@@ -51,11 +54,8 @@ def validate_pdf_files(documents: List[Dict], base_path: Path) -> List[Path]:
         
         # Try different possible locations for PDF files
         # Handle both original names and the actual file names with prefixes
-        actual_filename = None
-        for asset_file in Path('attached_assets').glob('*.pdf'):
-            if filename.replace('.pdf', '') in asset_file.name:
-                actual_filename = asset_file.name
-                break
+        stem = filename.replace('.pdf', '')
+        actual_filename = next((name for name in asset_names if stem in name), None)
         
         possible_paths = [
             base_path / filename,
@@ -85,21 +85,32 @@ def validate_pdf_files(documents: List[Dict], base_path: Path) -> List[Path]:
     return pdf_paths
 
 
+# (role substring, task substring) -> query template; the first matching pair wins
+PERSONA_QUERY_TEMPLATES = {
+    ('travel planner', 'college friends'): (
+        "As a {role}, I need to find information to help me {task}. "
+        "I am looking for fun activities, nightlife, entertainment, dining options, "
+        "budget-friendly recommendations, group activities, cultural experiences, "
+        "and practical travel tips suitable for young adults and college students."
+    )
+}
+DEFAULT_QUERY_TEMPLATE = "As a {role}, I need to find information to help me {task}."
+
+
 def create_analysis_query(persona: Dict, job_to_be_done: Dict) -> str:
     """Create an enriched query for semantic analysis."""
     role = persona.get('role', 'User')
     task = job_to_be_done.get('task', 'Find relevant information')
     
     # Create a rich query that combines persona and task context
-    if 'travel planner' in role.lower() and 'college friends' in task.lower():
-        query = (
-            f"As a {role}, I need to find information to help me {task.lower()}. "
-            "I am looking for fun activities, nightlife, entertainment, dining options, "
-            "budget-friendly recommendations, group activities, cultural experiences, "
-            "and practical travel tips suitable for young adults and college students."
-        )
-    else:
-        query = f"As a {role}, I need to find information to help me {task.lower()}."
+    role_lower = role.lower()
+    task_lower = task.lower()
+    template = next(
+        (template for (role_key, task_key), template in PERSONA_QUERY_TEMPLATES.items()
+         if role_key in role_lower and task_key in task_lower),
+        DEFAULT_QUERY_TEMPLATE
+    )
+    query = template.format(role=role, task=task_lower)
     
     logger.info(f"Created analysis query: {query}")
     return query
@@ -121,7 +132,7 @@ def generate_output_json(
             "input_documents": doc_names,
             "persona": input_data['persona']['role'],
             "job_to_be_done": input_data['job_to_be_done']['task'],
-            "processing_timestamp": time.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3],
+            "processing_timestamp": datetime.now().isoformat(timespec='milliseconds'),
             "processing_time_seconds": round(processing_time, 2)
         },
         "extracted_sections": section_rankings,
@@ -131,9 +142,29 @@ def generate_output_json(
     return output
 
 
+def write_output_json(output: Dict[str, Any], output_path: Path):
+    """Stream the output JSON to disk one top-level field and list item at a time."""
+    # Encoded strings never contain raw newlines, so nested items are re-indented
+    # by prefixing every line break
+    with open(output_path, 'wb') as f:
+        f.write(b'{')
+        for i, (key, value) in enumerate(output.items()):
+            f.write(b',\n  ' if i else b'\n  ')
+            f.write(json_dumps(key) + b': ')
+            if isinstance(value, list) and value:
+                f.write(b'[')
+                for j, item in enumerate(value):
+                    f.write(b',\n    ' if j else b'\n    ')
+                    f.write(json_dumps(item).replace(b'\n', b'\n    '))
+                f.write(b'\n  ]')
+            else:
+                f.write(json_dumps(value).replace(b'\n', b'\n  '))
+        f.write(b'\n}' if output else b'}')
+
+
 def main():
     """Main execution function."""
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     try:
         # Configuration
@@ -179,13 +210,12 @@ def main():
         section_rankings, subsection_analysis = analyzer.analyze_documents(pdf_paths, query)
         
         # Generate output
-        processing_time = time.time() - start_time
+        processing_time = time.perf_counter() - start_time
         output = generate_output_json(input_data, section_rankings, subsection_analysis, processing_time)
         
         # Write output
         output_path = Path('challenge1b_output.json')
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(output, f, indent=2, ensure_ascii=False)
+        write_output_json(output, output_path)
         
         logger.info(f"Analysis completed in {processing_time:.2f} seconds")
         logger.info(f"Output written to: {output_path}")
@@ -1,14 +1,15 @@
-import json
 import sys
 import time
 import logging
 import argparse
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
 from document_analyzer import DocumentAnalyzer
 from config import Config
+from utils import json_dumps, json_loads
+from collection_runner import default_workers, process_collections
 
 # Configure logging
 logging.basicConfig(
@@ -24,8 +25,7 @@ logger = logging.getLogger(__name__)
 def load_input_json(input_path: Path) -> Dict[str, Any]:
     """Load and validate input JSON file."""
     try:
-        with open(input_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = json_loads(input_path.read_bytes())
         
         # Validate required fields
         required_fields = ['documents', 'persona', 'job_to_be_done']
@@ -60,8 +60,9 @@ def validate_pdf_files(documents: List[Dict], pdf_dir: Path) -> List[Path]:
     return pdf_paths
 
 
-def process_collection(collection_path: Path, config: Config) -> Dict[str, Any]:
-    """Process a single collection."""
+def process_collection(collection_path: Path, config: Config,
+                       analyzer: Optional[DocumentAnalyzer] = None) -> Dict[str, Any]:
+    """Process a single collection, reusing the given analyzer when there is one."""
     logger.info(f"Processing collection: {collection_path}")
     
     # File paths
@@ -81,11 +82,12 @@ def process_collection(collection_path: Path, config: Config) -> Dict[str, Any]:
     # Validate PDF files
     pdf_paths = validate_pdf_files(input_data['documents'], pdf_dir)
     
-    # Initialize analyzer
-    analyzer = DocumentAnalyzer(config)
+    # Initialize analyzer unless the caller shares one across collections
+    if analyzer is None:
+        analyzer = DocumentAnalyzer(config)
     
     # Run analysis
-    start_time = time.time()
+    start_time = time.perf_counter()
     logger.info(f"Starting analysis of {len(pdf_paths)} documents...")
     
     try:
@@ -109,7 +111,7 @@ def process_collection(collection_path: Path, config: Config) -> Dict[str, Any]:
             'subsection_analysis': subsection_analysis
         }
         
-        processing_time = time.time() - start_time
+        processing_time = time.perf_counter() - start_time
         
         # Add processing metadata
         results['metadata']['processing_timestamp'] = datetime.now().isoformat()
@@ -117,8 +119,7 @@ def process_collection(collection_path: Path, config: Config) -> Dict[str, Any]:
         results['metadata']['collection_path'] = str(collection_path)
         
         # Save results
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+        output_file.write_bytes(json_dumps(results))
         
         logger.info(f"Collection completed in {processing_time:.2f} seconds")
         logger.info(f"Results saved to: {output_file}")
@@ -138,7 +139,7 @@ def process_collection(collection_path: Path, config: Config) -> Dict[str, Any]:
             'collection': str(collection_path),
             'success': False,
             'error': str(e),
-            'processing_time': time.time() - start_time
+            'processing_time': time.perf_counter() - start_time
         }
 
 
@@ -163,6 +164,12 @@ def main():
         default='Challenge_1b',
         help='Base directory containing collections (default: Challenge_1b)'
     )
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=default_workers(),
+        help='Collections to process in parallel with --all (default: CPU count - 1)'
+    )
     
     args = parser.parse_args()
     
@@ -193,9 +200,7 @@ def main():
             
             logger.info(f"Found {len(collection_dirs)} collections to process")
             
-            for collection_dir in collection_dirs:
-                result = process_collection(collection_dir, config)
-                results.append(result)
+            results.extend(process_collections(collection_dirs, config, args.workers, process_collection))
         
         else:
             # Backward compatibility - process legacy format
@@ -222,22 +227,23 @@ def main():
             
             # Process using attached_assets
             analyzer = DocumentAnalyzer(config)
-            start_time = time.time()
+            start_time = time.perf_counter()
             
-            # Validate PDF files in attached_assets
+            # Validate PDF files in attached_assets, listing the directory once
+            asset_files = list(Path('attached_assets').glob('*.pdf'))
             pdf_paths = []
             for doc in input_data['documents']:
                 filename = doc.get('filename', '')
                 # Try to find the actual file with the original logic
-                for asset_file in Path('attached_assets').glob('*.pdf'):
-                    if filename.replace('.pdf', '') in asset_file.name:
-                        pdf_paths.append(asset_file)
-                        break
-                else:
+                stem = filename.replace('.pdf', '')
+                asset_file = next((f for f in asset_files if stem in f.name), None)
+                if asset_file is None:
                     # Try exact filename match
                     exact_path = Path('attached_assets') / filename
                     if exact_path.exists():
-                        pdf_paths.append(exact_path)
+                        asset_file = exact_path
+                if asset_file is not None:
+                    pdf_paths.append(asset_file)
             
             if not pdf_paths:
                 raise FileNotFoundError("No PDF files found in attached_assets")
@@ -260,14 +266,13 @@ def main():
                 'subsection_analysis': subsection_analysis
             }
             
-            processing_time = time.time() - start_time
+            processing_time = time.perf_counter() - start_time
             results_data['metadata']['processing_timestamp'] = datetime.now().isoformat()
             results_data['metadata']['processing_time_seconds'] = round(processing_time, 2)
             
             # Save results
-            output_file = "challenge1b_output.json"
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(results_data, f, indent=2, ensure_ascii=False)
+            output_file = Path("challenge1b_output.json")
+            output_file.write_bytes(json_dumps(results_data))
             
             results.append({
                 'collection': 'attached_assets',
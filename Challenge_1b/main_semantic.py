@@ -1,14 +1,16 @@
-import json
 import sys
 import time
 import logging
 import argparse
+import os
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
 from document_analyzer import DocumentAnalyzer
 from config import Config
+from utils import json_dumps, json_loads
+from collection_runner import default_workers, process_collections
 from enhanced_ranking import PersonaRanking
 
 # Configure logging
@@ -25,8 +27,7 @@ logger = logging.getLogger(__name__)
 def load_input_json(input_path: Path) -> Dict[str, Any]:
     """Load and validate input JSON file."""
     try:
-        with open(input_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = json_loads(input_path.read_bytes())
         
         # Validate required fields
         required_fields = ['documents', 'persona', 'job_to_be_done']
@@ -42,6 +43,14 @@ def load_input_json(input_path: Path) -> Dict[str, Any]:
         raise
 
 
+def _list_names(directory: Path) -> List[str]:
+    """Entry names of a directory, or none when it does not exist."""
+    try:
+        return os.listdir(directory)
+    except OSError:
+        return []
+
+
 def validate_pdf_files(documents: List[Dict], collection_path: Path) -> List[Path]:
     """Validate that all PDF files exist and return their paths."""
     pdf_paths = []
@@ -50,27 +59,28 @@ def validate_pdf_files(documents: List[Dict], collection_path: Path) -> List[Pat
     # Also check attached_assets for the actual PDF files
     attached_assets = Path("attached_assets")
     
+    # List each directory once; documents are then resolved against the snapshots
+    pdf_dir_names = set(_list_names(pdf_dir))
+    asset_names = set(_list_names(attached_assets))
+    asset_pdfs = [asset_file.name for asset_file in attached_assets.glob("*.pdf")]
+    
     for doc in documents:
         filename = doc.get('filename', '')
         if not filename:
             raise ValueError("Document missing filename")
         
-        # Try multiple locations for PDF files
-        possible_paths = [
-            pdf_dir / filename,
-            attached_assets / filename
-        ]
-        
-        # Also check for files with prefixes in attached_assets
-        for asset_file in attached_assets.glob("*.pdf"):
-            if filename.replace('.pdf', '') in asset_file.name or asset_file.name.endswith(filename):
-                possible_paths.append(asset_file)
-        
-        pdf_path = None
-        for path in possible_paths:
-            if path.exists():
-                pdf_path = path
-                break
+        # Try multiple locations for PDF files, then files with prefixes in attached_assets
+        if filename in pdf_dir_names:
+            pdf_path = pdf_dir / filename
+        elif filename in asset_names:
+            pdf_path = attached_assets / filename
+        else:
+            stem = filename.replace('.pdf', '')
+            pdf_path = next(
+                (attached_assets / name for name in asset_pdfs
+                 if stem in name or name.endswith(filename)),
+                None
+            )
         
         if pdf_path is None:
             raise FileNotFoundError(f"PDF file not found: {filename}")
@@ -81,49 +91,53 @@ def validate_pdf_files(documents: List[Dict], collection_path: Path) -> List[Pat
     return pdf_paths
 
 
+# (role substring, task substring) -> query template, checked in order; the first
+# matching pair wins and an empty task substring matches any task
+PERSONA_QUERY_TEMPLATES = {
+    ('travel planner', 'college friends'): (
+        "As a {role}, I need to {task}. "
+        "I am specifically looking for destinations, activities, coastal adventures, "
+        "culinary experiences, food options, nightlife, entertainment, travel tips, "
+        "budget-friendly recommendations, group activities for young adults."
+    ),
+    ('travel planner', ''): "As a {role}, I need to {task}. Travel destinations, activities, food, tips.",
+    ('hr professional', ''): (
+        "As a {role}, I need to {task}. "
+        "I am looking for form creation, fillable forms, document conversion, "
+        "bulk operations, workflow management, signature processes, compliance tools."
+    ),
+    ('food contractor', 'vegetarian'): (
+        "As a {role}, I need to {task}. "
+        "I am looking for vegetarian recipes, protein sources, substantial sides, "
+        "appetizers, gluten-free options, buffet-style dishes, corporate catering."
+    ),
+    ('food contractor', ''): "As a {role}, I need to {task}. Recipes, ingredients, cooking instructions."
+}
+DEFAULT_QUERY_TEMPLATE = "As a {role}, I need to {task}."
+
+
 def create_enhanced_query(persona: Dict, job_to_be_done: Dict) -> str:
     """Create an enhanced query that captures persona-specific needs."""
     role = persona.get('role', 'User')
     task = job_to_be_done.get('task', 'Find relevant information')
     
     # Enhanced queries based on expected output patterns
-    if 'travel planner' in role.lower():
-        if 'college friends' in task.lower():
-            query = (
-                f"As a {role}, I need to {task.lower()}. "
-                "I am specifically looking for destinations, activities, coastal adventures, "
-                "culinary experiences, food options, nightlife, entertainment, travel tips, "
-                "budget-friendly recommendations, group activities for young adults."
-            )
-        else:
-            query = f"As a {role}, I need to {task.lower()}. Travel destinations, activities, food, tips."
-    
-    elif 'hr professional' in role.lower():
-        query = (
-            f"As a {role}, I need to {task.lower()}. "
-            "I am looking for form creation, fillable forms, document conversion, "
-            "bulk operations, workflow management, signature processes, compliance tools."
-        )
-    
-    elif 'food contractor' in role.lower():
-        if 'vegetarian' in task.lower():
-            query = (
-                f"As a {role}, I need to {task.lower()}. "
-                "I am looking for vegetarian recipes, protein sources, substantial sides, "
-                "appetizers, gluten-free options, buffet-style dishes, corporate catering."
-            )
-        else:
-            query = f"As a {role}, I need to {task.lower()}. Recipes, ingredients, cooking instructions."
-    
-    else:
-        query = f"As a {role}, I need to {task.lower()}."
+    role_lower = role.lower()
+    task_lower = task.lower()
+    template = next(
+        (template for (role_key, task_key), template in PERSONA_QUERY_TEMPLATES.items()
+         if role_key in role_lower and task_key in task_lower),
+        DEFAULT_QUERY_TEMPLATE
+    )
+    query = template.format(role=role, task=task_lower)
     
     logger.info(f"Created enhanced query: {query}")
     return query
 
 
-def process_collection(collection_path: Path, config: Config) -> Dict[str, Any]:
-    """Process a single collection."""
+def process_collection(collection_path: Path, config: Config,
+                       analyzer: Optional[DocumentAnalyzer] = None) -> Dict[str, Any]:
+    """Process a single collection, reusing the given analyzer when there is one."""
     logger.info(f"Processing collection: {collection_path}")
     
     # File paths
@@ -140,11 +154,12 @@ def process_collection(collection_path: Path, config: Config) -> Dict[str, Any]:
     # Validate PDF files
     pdf_paths = validate_pdf_files(input_data['documents'], collection_path)
     
-    # Initialize analyzer
-    analyzer = DocumentAnalyzer(config)
+    # Initialize analyzer unless the caller shares one across collections
+    if analyzer is None:
+        analyzer = DocumentAnalyzer(config)
     
     # Run analysis
-    start_time = time.time()
+    start_time = time.perf_counter()
     logger.info(f"Starting analysis of {len(pdf_paths)} documents...")
     
     try:
@@ -164,6 +179,9 @@ def process_collection(collection_path: Path, config: Config) -> Dict[str, Any]:
             input_data['job_to_be_done']['task']
         )
         
+        # Bind the elapsed time once so the metadata and the log agree
+        processing_time = time.perf_counter() - start_time
+        
         # Format results into expected JSON structure
         results = {
             'metadata': {
@@ -171,17 +189,15 @@ def process_collection(collection_path: Path, config: Config) -> Dict[str, Any]:
                 'persona': input_data['persona']['role'],
                 'job_to_be_done': input_data['job_to_be_done']['task'],
                 'processing_timestamp': datetime.now().isoformat(),
-                'processing_time_seconds': round(time.time() - start_time, 2)
+                'processing_time_seconds': round(processing_time, 2)
             },
             'extracted_sections': section_rankings,
             'subsection_analysis': subsection_analysis
         }
         
         # Save results
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+        output_file.write_bytes(json_dumps(results))
         
-        processing_time = time.time() - start_time
         logger.info(f"Collection completed in {processing_time:.2f} seconds")
         logger.info(f"Results saved to: {output_file}")
         
@@ -200,7 +216,7 @@ def process_collection(collection_path: Path, config: Config) -> Dict[str, Any]:
             'collection': str(collection_path),
             'success': False,
             'error': str(e),
-            'processing_time': time.time() - start_time
+            'processing_time': time.perf_counter() - start_time
         }
 
 
@@ -219,6 +235,12 @@ def main():
         action='store_true', 
         help='Process all collections'
     )
+    parser.add_argument(
+        '--workers', 
+        type=int, 
+        default=default_workers(), 
+        help='Collections to process in parallel (default: CPU count - 1)'
+    )
     
     args = parser.parse_args()
     
@@ -249,15 +271,11 @@ def main():
         return 1
     
     # Process each collection
-    total_start_time = time.time()
-    results = []
-    
-    for collection_path in collections_to_process:
-        result = process_collection(collection_path, config)
-        results.append(result)
+    total_start_time = time.perf_counter()
+    results = process_collections(collections_to_process, config, args.workers, process_collection)
     
     # Summary
-    total_time = time.time() - total_start_time
+    total_time = time.perf_counter() - total_start_time
     successful_collections = [r for r in results if r['success']]
     failed_collections = [r for r in results if not r['success']]
     
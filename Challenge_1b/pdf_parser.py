@@ -2,23 +2,115 @@ import logging
 from pathlib import Path
 from typing import List, Dict, Any, Tuple
 import re
+import os
+import hashlib
+import pickle
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from operator import itemgetter
+from contextlib import nullcontext
+from array import array
+from dataclasses import dataclass, field
 
-# Use pdfplumber for PDF processing (already available)
+# PyMuPDF's native text extraction, used instead of pdfplumber when config.use_pymupdf is set
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # PyMuPDF is optional; documents are parsed with pdfplumber instead
+    fitz = None
 import pdfplumber
-fitz = None
 
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Maximal runs of non-empty lines, i.e. the pieces of text.split('\n\n')
+_PARAGRAPH_RE = re.compile(r'[^\n]+(?:\n(?!\n)[^\n]+)*')
+# Bumped whenever the pickled parse result layout or text extraction changes, so old cache entries miss
+_CACHE_VERSION = 3
+
+# PyMuPDF word extraction with ligatures expanded (U+FB00 'ﬀ' -> 'ff'), as pdfplumber reports them
+_PYMUPDF_TEXT_FLAGS = fitz.TEXTFLAGS_WORDS & ~fitz.TEXT_PRESERVE_LIGATURES if fitz is not None else 0
+# Words whose bottoms lie within this many points share a line (pdfplumber's y_tolerance)
+_LINE_TOLERANCE = 3
+# Symbol-font bullet that PyMuPDF reports as a private-use code point
+_PUA_BULLET = '\uf0b7'
+# Batches up to this many documents are parsed in-process when PyMuPDF is the backend
+_PYMUPDF_INLINE_DOCUMENTS = 32
+
+
+@dataclass(slots=True)
+class DocumentChunks:
+    """One document's paragraph chunks as aligned columns; the source name is stored once."""
+    
+    source_document: str
+    texts: List[str] = field(default_factory=list)
+    section_titles: List[str] = field(default_factory=list)
+    page_numbers: array = field(default_factory=lambda: array('i'))
+    
+    def __len__(self) -> int:
+        return len(self.texts)
+    
+    def extend(self, other: 'DocumentChunks'):
+        """Append another run of chunks from the same document, e.g. a later page range."""
+        self.texts.extend(other.texts)
+        self.section_titles.extend(other.section_titles)
+        self.page_numbers.extend(other.page_numbers)
+
+
+# Per-process parser used by the parse_documents pool workers
+_worker_parser = None
+
+
+def _init_worker(config: Config):
+    """Pool initializer: build one PDFParser per worker process."""
+    global _worker_parser
+    _worker_parser = PDFParser(config)
+
+
+def _parse_in_worker(pdf_path: Path) -> Tuple[DocumentChunks, Dict]:
+    """Worker entry point: parse one PDF with the process-local parser."""
+    return _worker_parser.parse_document(pdf_path)
+
+
+def _parse_pages_in_worker(pdf_path: Path, start: int, stop: int) -> DocumentChunks:
+    """Worker entry point: chunk one contiguous page range of a PDF."""
+    return _worker_parser._parse_page_range(pdf_path, start, stop)
+
+
+def _prefetch_files(paths: List[Path]):
+    """Ask the kernel to read files into the page cache in the background (POSIX only)."""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue  # Missing or unreadable files are reported by the parse itself
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
 
 class PDFParser:
     """Extracts structured text content from PDF documents."""
     
     def __init__(self, config: Config):
         self.config = config
+        self._use_pymupdf = fitz is not None and config.use_pymupdf
+        # Parse results by file identity (size, mtime, resolved path), least recently
+        # used first and capped at config.parse_memo_size documents. Identical PDFs
+        # (e.g. shared between collections) alias the first copy's identity, so each
+        # is parsed once while its entry is kept
+        self._parsed: OrderedDict[Tuple[int, int, str], Tuple[DocumentChunks, Dict]] = OrderedDict()
+        self._aliases: Dict[Tuple[int, int, str], Tuple[int, int, str]] = {}
+        self._identities_by_size: Dict[int, List[Tuple[int, int, str]]] = {}
+        self._digests: Dict[Tuple[int, int, str], str | None] = {}
         
-    def parse_document(self, pdf_path: Path) -> Tuple[List[Dict], Dict]:
+    def parse_document(self, pdf_path: Path) -> Tuple[DocumentChunks, Dict]:
         """
         Parse a PDF document and extract structured text chunks.
         
@@ -30,19 +122,262 @@ class PDFParser:
         """
         logger.info(f"Parsing PDF: {pdf_path}")
         
-        # Use pdfplumber since PyMuPDF is not available
-        return self._parse_with_pdfplumber(pdf_path)
+        cached = self._load_cached(pdf_path)
+        if cached is not None:
+            return cached
+        
+        if self._use_pymupdf:
+            result = self._parse_with_pymupdf(pdf_path)
+        else:
+            result = self._parse_with_pdfplumber(pdf_path)
+        
+        self._store_cached(pdf_path, result)
+        return result
+    
+    def parse_documents(self, pdf_paths: List[Path]) -> List[Tuple[DocumentChunks, Dict]]:
+        """
+        Parse several PDF documents, in parallel worker processes when cores allow.
+        
+        Args:
+            pdf_paths: Paths to the PDF files
+            
+        Returns:
+            (text_chunks, document_metadata) per path, in input order
+        """
+        # Queue every file's reads up front, so later documents load while earlier
+        # ones are hashed or parsed (memo keys come from stat and read nothing unless
+        # two files share a size)
+        _prefetch_files(pdf_paths)
+        keys = [self._memo_key(pdf_path) for pdf_path in pdf_paths]
+        results = {}
+        pending = {}
+        for key, pdf_path in zip(keys, pdf_paths):
+            if key in self._parsed:
+                results[key] = self._parsed[key]
+                self._parsed.move_to_end(key)
+            else:
+                pending.setdefault(key, pdf_path)
+        if len(pending) < len(pdf_paths):
+            logger.info(f"Reusing parse results for {len(pdf_paths) - len(pending)} already-parsed documents")
+        
+        if pending:
+            for key, result in zip(pending, self._parse_batch(list(pending.values()))):
+                results[key] = self._parsed[key] = result
+        self._evict_parsed()
+        
+        return [self._relabel(results[key], pdf_path) for key, pdf_path in zip(keys, pdf_paths)]
+    
+    def _evict_parsed(self):
+        """Drop the least recently used parse results beyond the memo size, with their identities."""
+        evicted = set()
+        while len(self._parsed) > max(0, self.config.parse_memo_size):
+            evicted.add(self._parsed.popitem(last=False)[0])
+        if not evicted:
+            return
+        
+        for identity in [identity for identity, key in self._aliases.items() if key in evicted]:
+            del self._aliases[identity]
+            self._digests.pop(identity, None)
+            same_size = self._identities_by_size[identity[0]]
+            same_size.remove(identity)
+            if not same_size:
+                del self._identities_by_size[identity[0]]
+    
+    def _parse_batch(self, pdf_paths: List[Path]) -> List[Tuple[DocumentChunks, Dict]]:
+        """Parse distinct documents, in parallel worker processes when cores allow."""
+        # Documents are independent; pdfplumber is pure Python, so parallelism
+        # needs processes rather than threads to get past the GIL
+        max_workers = self.config.parser_workers or os.cpu_count() or 1
+        if self._use_pymupdf:
+            # MuPDF parses a document in tens of milliseconds, so worker start-up and
+            # result pickling outweigh the parallelism until the batch is large
+            if len(pdf_paths) <= _PYMUPDF_INLINE_DOCUMENTS:
+                max_workers = 1
+        elif len(pdf_paths) == 1 and max_workers > 1:
+            # A lone document leaves the per-document pool idle; split its pages instead
+            return [self._parse_pages_in_parallel(pdf_paths[0], max_workers)]
+        
+        workers = min(len(pdf_paths), max_workers)
+        if workers <= 1:
+            return [self.parse_document(pdf_path) for pdf_path in pdf_paths]
+        
+        logger.info(f"Parsing {len(pdf_paths)} documents with {workers} worker processes")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.config,)) as executor:
+            return list(executor.map(_parse_in_worker, pdf_paths, chunksize=1))
+    
+    def _memo_key(self, pdf_path: Path) -> Tuple[int, int, str]:
+        """Memo key for a PDF: its file identity, or that of an identical file seen earlier."""
+        stat = pdf_path.stat()
+        identity = (stat.st_size, stat.st_mtime_ns, str(pdf_path.resolve()))
+        key = self._aliases.get(identity)
+        if key is not None:
+            return key
+        
+        # Files are told apart by stat alone; contents are only hashed (once each)
+        # when sizes collide, to catch copies under other paths
+        key = identity
+        same_size = self._identities_by_size.setdefault(stat.st_size, [])
+        for other in same_size:
+            digest = self._content_digest(other)
+            if digest is not None and digest == self._content_digest(identity):
+                key = self._aliases[other]
+                break
+        same_size.append(identity)
+        self._aliases[identity] = key
+        return key
+    
+    def _content_digest(self, identity: Tuple[int, int, str]) -> str | None:
+        """Hash of the bytes of the file an identity names, or None if it has changed since."""
+        if identity not in self._digests:
+            path = Path(identity[2])
+            try:
+                stat = path.stat()
+                unchanged = (stat.st_size, stat.st_mtime_ns) == identity[:2]
+                self._digests[identity] = (hashlib.blake2b(path.read_bytes(), digest_size=16).hexdigest()
+                                           if unchanged else None)
+            except OSError:
+                self._digests[identity] = None
+        return self._digests[identity]
+    
+    @staticmethod
+    def _relabel(result: Tuple[DocumentChunks, Dict], pdf_path: Path) -> Tuple[DocumentChunks, Dict]:
+        """Attribute a (possibly shared) parse result to the path it was requested for."""
+        chunks, metadata = result
+        if chunks.source_document == pdf_path.name:
+            return result
+        
+        # Columns are shared with the memoized result; consumers only read them
+        chunks = DocumentChunks(pdf_path.name, chunks.texts, chunks.section_titles, chunks.page_numbers)
+        metadata = {**metadata, 'filename': pdf_path.name, 'title': pdf_path.stem}
+        return chunks, metadata
+    
+    def _parse_with_pymupdf(self, pdf_path: Path) -> Tuple[DocumentChunks, Dict[str, Any]]:
+        """Parse using PyMuPDF text blocks."""
+        try:
+            chunks = DocumentChunks(pdf_path.name)
+            with fitz.open(pdf_path, filetype="pdf") as doc:
+                total_pages = len(doc)
+                
+                document_metadata = {
+                    'filename': pdf_path.name,
+                    'total_pages': total_pages,
+                    'title': pdf_path.stem
+                }
+                
+                for page_num, page in enumerate(doc.pages(), 1):
+                    self._extract_page_chunks_pymupdf(page, page_num, chunks)
+            
+            logger.info(f"Extracted {len(chunks)} chunks from {pdf_path.name} using PyMuPDF")
+            return chunks, document_metadata
+            
+        except Exception as e:
+            logger.error(f"Failed to parse {pdf_path} with PyMuPDF: {e}")
+            raise
+    
+    def _parse_pages_in_parallel(self, pdf_path: Path, max_workers: int) -> Tuple[DocumentChunks, Dict]:
+        """Parse one PDF by chunking contiguous page ranges in worker processes."""
+        logger.info(f"Parsing PDF: {pdf_path}")
+        
+        cached = self._load_cached(pdf_path)
+        if cached is not None:
+            return cached
+        
+        try:
+            with pdfplumber.open(pdf_path) as pdf:
+                total_pages = len(pdf.pages)
+                workers = min(max_workers, total_pages)
+                if workers <= 1:
+                    # Not worth a pool: parse through the handle already open
+                    result = self._parse_with_pdfplumber(pdf_path, pdf)
+                    self._store_cached(pdf_path, result)
+                    return result
+        except Exception as e:
+            logger.error(f"Failed to parse {pdf_path} with pdfplumber: {e}")
+            raise
+        
+        # Contiguous ranges keep each worker's page tree walk local; map preserves page order
+        bounds = [total_pages * i // workers for i in range(workers + 1)]
+        logger.info(f"Parsing {total_pages} pages of {pdf_path.name} with {workers} worker processes")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.config,)) as executor:
+            chunks = DocumentChunks(pdf_path.name)
+            for page_chunks in executor.map(_parse_pages_in_worker, repeat(pdf_path), bounds[:-1], bounds[1:]):
+                chunks.extend(page_chunks)
+        
+        document_metadata = {
+            'filename': pdf_path.name,
+            'total_pages': total_pages,
+            'title': pdf_path.stem
+        }
+        
+        logger.info(f"Extracted {len(chunks)} chunks from {pdf_path.name} using pdfplumber")
+        self._store_cached(pdf_path, (chunks, document_metadata))
+        return chunks, document_metadata
+    
+    def _cache_file(self, pdf_path: Path) -> Path:
+        """Cache entry for a PDF, keyed on its path, mtime, size and the chunking settings."""
+        st = pdf_path.stat()
+        backend = 'pymupdf' if self._use_pymupdf else 'pdfplumber'
+        key = hashlib.blake2b(
+            f"{pdf_path.resolve()}:{st.st_mtime_ns}:{st.st_size}:"
+            f"{self.config.min_chunk_length}:{backend}:{_CACHE_VERSION}".encode('utf-8'),
+            digest_size=16
+        ).hexdigest()
+        return Path(self.config.parse_cache_dir) / f"{key}.pkl"
     
-    def _parse_with_pymupdf(self, pdf_path: Path) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-        """Parse using PyMuPDF (not available in this environment)."""
-        # PyMuPDF is not available, fallback to pdfplumber
-        return self._parse_with_pdfplumber(pdf_path)
+    def _load_cached(self, pdf_path: Path) -> Tuple[DocumentChunks, Dict] | None:
+        """Return the cached parse of an unchanged PDF, or None on a miss or when caching is off."""
+        if not self.config.parse_cache_dir:
+            return None
+        
+        try:
+            with open(self._cache_file(pdf_path), 'rb') as f:
+                result = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:  # Corrupt or stale-format entry: reparse and overwrite it
+            logger.warning(f"Ignoring unreadable parse cache entry for {pdf_path.name}: {e}")
+            return None
+        
+        logger.info(f"Loaded {len(result[0])} cached chunks for {pdf_path.name}")
+        return result
+    
+    def _store_cached(self, pdf_path: Path, result: Tuple[DocumentChunks, Dict]):
+        """Persist a parse result atomically so concurrent workers never read a partial file."""
+        if not self.config.parse_cache_dir:
+            return
+        
+        cache_file = self._cache_file(pdf_path)
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_file, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            logger.warning(f"Could not write parse cache entry for {pdf_path.name}: {e}")
     
-    def _parse_with_pdfplumber(self, pdf_path: Path) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-        """Fallback parsing using pdfplumber."""
+    def _parse_page_range(self, pdf_path: Path, start: int, stop: int) -> DocumentChunks:
+        """Chunk pages [start, stop) of a PDF with pdfplumber."""
         try:
-            chunks = []
+            chunks = DocumentChunks(pdf_path.name)
             with pdfplumber.open(pdf_path) as pdf:
+                for page_num, page in enumerate(pdf.pages[start:stop], start + 1):
+                    self._chunk_page_text(page.extract_text(), page_num, chunks)
+                    page.close()  # Drop the page's cached layout objects once its text is out
+            return chunks
+            
+        except Exception as e:
+            logger.error(f"Failed to parse {pdf_path} with pdfplumber: {e}")
+            raise
+    
+    def _parse_with_pdfplumber(self, pdf_path: Path, pdf=None) -> Tuple[DocumentChunks, Dict[str, Any]]:
+        """Fallback parsing using pdfplumber, reusing an already-open PDF handle when given."""
+        try:
+            chunks = DocumentChunks(pdf_path.name)
+            # A caller-owned handle stays open; otherwise open and close the file here
+            with (nullcontext(pdf) if pdf is not None else pdfplumber.open(pdf_path)) as pdf:
                 total_pages = len(pdf.pages)
                 
                 document_metadata = {
@@ -52,20 +387,8 @@ class PDFParser:
                 }
                 
                 for page_num, page in enumerate(pdf.pages, 1):
-                    text = page.extract_text()
-                    if text and text.strip():
-                        # Simple paragraph-based chunking for pdfplumber
-                        paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
-                        
-                        for para in paragraphs:
-                            if len(para) >= self.config.min_chunk_length:
-                                chunk = {
-                                    'text': para,
-                                    'section_title': self._infer_section_title(para),
-                                    'page_number': page_num,
-                                    'source_document': pdf_path.name
-                                }
-                                chunks.append(chunk)
+                    self._chunk_page_text(page.extract_text(), page_num, chunks)
+                    page.close()
             
             logger.info(f"Extracted {len(chunks)} chunks from {pdf_path.name} using pdfplumber")
             return chunks, document_metadata
@@ -74,39 +397,48 @@ class PDFParser:
             logger.error(f"Failed to parse {pdf_path} with pdfplumber: {e}")
             raise
     
-    def _extract_page_chunks_pymupdf(self, page, page_number: int, document_name: str) -> List[Dict]:
-        """PyMuPDF not available - this method is unused."""
-        return []
+    def _chunk_page_text(self, text: str, page_num: int, chunks: DocumentChunks):
+        """Split one page's extracted text into paragraph chunks appended to chunks."""
+        if text:
+            # Simple paragraph-based chunking in one pass: stream blank-line separated runs
+            # of lines, gate on length and write each chunk straight into the columns
+            min_length = self.config.min_chunk_length
+            infer_title = self._infer_section_title
+            add_text = chunks.texts.append
+            add_title = chunks.section_titles.append
+            add_page = chunks.page_numbers.append
+            for match in _PARAGRAPH_RE.finditer(text):
+                para = match.group().strip()
+                if len(para) >= min_length:
+                    add_text(para)
+                    add_title(infer_title(para))
+                    add_page(page_num)
     
-    def _create_text_chunk(self, text: str, section_title: str, page_number: int, document_name: str) -> Dict[str, Any] | None:
-        """Create a standardized text chunk dictionary."""
-        # Clean the text
-        text = re.sub(r'\s+', ' ', text.strip())
-        
-        # Skip very short chunks
-        if len(text) < self.config.min_chunk_length:
-            return None
+    def _extract_page_chunks_pymupdf(self, page, page_number: int, chunks: DocumentChunks):
+        """Chunk a PyMuPDF page's text with the same paragraph rules as pdfplumber."""
+        # Rebuild lines the way pdfplumber's extract_text does: words are (x0, y0, x1, y1,
+        # text, ...); those with nearby bottoms form one line, read left to right
+        words = sorted(page.get_text("words", flags=_PYMUPDF_TEXT_FLAGS), key=itemgetter(3))
+        lines = []
+        last_bottom = None
+        for word in words:
+            if last_bottom is None or word[3] - last_bottom > _LINE_TOLERANCE:
+                lines.append([])
+            lines[-1].append(word)
+            last_bottom = word[3]
         
-        # Truncate very long chunks
-        if len(text) > self.config.max_chunk_length:
-            text = text[:self.config.max_chunk_length] + "..."
-        
-        return {
-            'text': text,
-            'section_title': section_title,
-            'page_number': page_number,
-            'source_document': document_name
-        }
+        text = '\n'.join(' '.join(word[4] for word in sorted(line, key=itemgetter(0))) for line in lines)
+        self._chunk_page_text(text.replace(_PUA_BULLET, '•'), page_number, chunks)
     
     def _infer_section_title(self, text: str) -> str:
         """Infer section title from text content (fallback method)."""
-        # Extract first sentence or phrase
-        sentences = text.split('. ')
-        if sentences:
-            first_sentence = sentences[0].strip()
-            if len(first_sentence) < 100:
-                return first_sentence
+        # Extract first sentence or phrase; only the text before the first '. ' is needed,
+        # so find it rather than splitting the whole paragraph
+        end = text.find('. ')
+        first_sentence = (text if end == -1 else text[:end]).strip()
+        if len(first_sentence) < 100:
+            return first_sentence
         
         # Fallback to first few words
-        words = text.split()[:5]
+        words = text.split(maxsplit=5)[:5]
         return ' '.join(words) + "..." if len(words) == 5 else ' '.join(words)
\ No newline at end of file
@@ -1,98 +1,259 @@
 import logging
-from typing import List, Dict, Any
-import math
+import hashlib
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple, Union
+from itertools import chain
 
-from config import Config
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; dict vectors are compared one pair at a time
+    np = None
+
+try:
+    from scipy.sparse import vstack as sparse_vstack
+except ImportError:  # SciPy is optional; query vectors are then dicts
+    sparse_vstack = None
+
+from config import Config, INT8_WEIGHT_SCALE
 
 logger = logging.getLogger(__name__)
 
 
+def _query_key(query_embedding) -> str:
+    """Content hash of a query vector (sparse row or dict) for the score cache."""
+    digest = hashlib.sha1()
+    if hasattr(query_embedding, "indices"):
+        digest.update(query_embedding.indices.tobytes())
+        digest.update(query_embedding.data.tobytes())
+    else:
+        digest.update(repr(sorted(query_embedding.items())).encode('utf-8'))
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=128)
+def _rank_weights(n: int) -> Tuple[Any, float]:
+    """Harmonic weights 1, 1/2, ..., 1/n and their sum; they depend only on n."""
+    weights = 1.0 / np.arange(1, n + 1, dtype=np.float64)
+    weights.flags.writeable = False  # Shared between calls through the cache
+    return weights, float(weights.sum())
+
+
 class RelevanceRetriever:
     """Retrieves and ranks relevant content based on keyword similarity."""
     
     def __init__(self, config: Config):
         self.config = config
+        # (query vector, similarity vector) by query hash, least recently used first;
+        # valid only for the chunk embeddings they were computed against
+        self._score_cache: OrderedDict[str, Tuple[Any, List[float]]] = OrderedDict()
+        self._cached_embeddings = None
+    
+    def clear_cache(self):
+        """Drop memoized similarity vectors, e.g. once the chunk set changes."""
+        self._score_cache.clear()
+        self._cached_embeddings = None
     
     def retrieve_relevant_chunks(
         self,
         chunks: List[Dict],
-        chunk_embeddings: List[Dict[str, float]],
-        query_embedding: Dict[str, float]
+        chunk_embeddings: Union[List[Dict[str, float]], Any],
+        query_embedding: Union[Dict[str, float], Any]
     ) -> List[Dict]:
         """
         Retrieve and rank chunks by relevance to the query.
         
         Args:
             chunks: List of text chunks with metadata
-            chunk_embeddings: Keyword vectors for all chunks
-            query_embedding: Keyword vector for the query
+            chunk_embeddings: L2-normalized keyword vectors for all chunks (list of
+                dicts, or a sparse matrix)
+            query_embedding: L2-normalized keyword vector for the query (dict, or
+                a 1 x |V| sparse row)
             
         Returns:
             List of chunks ranked by relevance, with relevance scores added
         """
-        if len(chunks) == 0 or len(chunk_embeddings) == 0:
+        n_embeddings = chunk_embeddings.shape[0] if hasattr(chunk_embeddings, "shape") else len(chunk_embeddings)
+        if len(chunks) == 0 or n_embeddings == 0:
             return []
         
-        logger.info(f"Computing relevance for {len(chunks)} chunks")
+        similarities = self._compute_similarities(chunk_embeddings, query_embedding)
         
-        # Compute similarity between query and all chunks
-        similarities = []
-        for chunk_vector in chunk_embeddings:
-            similarity = self._cosine_similarity(query_embedding, chunk_vector)
-            similarities.append(similarity)
+        # Skip None chunks from filtering before ranking
+        rows = [i for i, chunk in enumerate(chunks) if chunk is not None]
         
-        # Add relevance scores to chunks
-        scored_chunks = []
-        for i, chunk in enumerate(chunks):
-            if chunk is None:  # Skip None chunks from filtering
-                continue
-                
-            chunk_with_score = chunk.copy()
-            chunk_with_score['relevance_score'] = similarities[i]
-            scored_chunks.append(chunk_with_score)
+        # Ranking works on row numbers, so only the surviving top rows are copied,
+        # each in a single allocation with its relevance score added
+        return [dict(chunks[i], relevance_score=score) for i, score in self._top_rows(similarities, rows)]
+    
+    def rank_chunks(
+        self,
+        chunk_embeddings: Union[List[Dict[str, float]], Any],
+        query_embedding: Union[Dict[str, float], Any],
+        row_map: Optional[List[int]] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Rank chunk rows by relevance without materializing chunk records.
         
-        # Sort by relevance score (descending)
-        scored_chunks.sort(key=lambda x: x['relevance_score'], reverse=True)
+        Args:
+            chunk_embeddings: Keyword vectors for all chunks, as for retrieve_relevant_chunks
+            query_embedding: Keyword vector for the query
+            row_map: Embedding row for each chunk row when duplicate chunks share
+                one embedding; None when rows correspond one to one
+            
+        Returns:
+            (row, relevance_score) pairs for the top rows above the relevance
+            threshold, best first
+        """
+        n_embeddings = chunk_embeddings.shape[0] if hasattr(chunk_embeddings, "shape") else len(chunk_embeddings)
+        if n_embeddings == 0:
+            return []
         
-        # Apply relevance threshold filter
-        filtered_chunks = [
-            chunk for chunk in scored_chunks
-            if chunk['relevance_score'] >= self.config.relevance_threshold
-        ]
+        similarities = self._compute_similarities(chunk_embeddings, query_embedding)
+        if row_map is not None:
+            # Score each distinct embedding once, then scatter the scores to chunk rows
+            similarities = [similarities[i] for i in row_map]
+        return self._top_rows(similarities, range(len(similarities)))
+    
+    def _compute_similarities(self, chunk_embeddings, query_embedding) -> List[float]:
+        """Cosine similarity between the query and every chunk row, memoized per query."""
+        cache_size = self.config.retrieval_cache_size
+        if cache_size <= 0:
+            return self._score_chunks(chunk_embeddings, query_embedding)
         
-        # Take top N chunks
-        top_chunks = filtered_chunks[:self.config.max_retrieved_chunks]
+        if chunk_embeddings is not self._cached_embeddings:
+            # Scores computed against another chunk set no longer apply
+            self.clear_cache()
+            self._cached_embeddings = chunk_embeddings
         
-        logger.info(f"Retrieved {len(top_chunks)} relevant chunks")
+        key = _query_key(query_embedding)
+        if key not in self._score_cache and self.config.semantic_cache_tau is not None:
+            # Near-duplicate queries share the scores of the closest cached query
+            key = self._nearest_cached_query(query_embedding) or key
         
-        if top_chunks:
-            logger.info(f"Top relevance score: {top_chunks[0]['relevance_score']:.4f}")
-            logger.info(f"Lowest relevance score: {top_chunks[-1]['relevance_score']:.4f}")
+        cached = self._score_cache.get(key)
+        if cached is not None:
+            self._score_cache.move_to_end(key)
+            logger.info("Reusing cached relevance scores for this query")
+            return cached[1]
         
-        return top_chunks
+        similarities = self._score_chunks(chunk_embeddings, query_embedding)
+        self._score_cache[key] = (query_embedding, similarities)
+        if len(self._score_cache) > cache_size:
+            self._score_cache.popitem(last=False)
+        return similarities
     
-    def _cosine_similarity(self, vec1: Dict[str, float], vec2: Dict[str, float]) -> float:
-        """Calculate cosine similarity between two keyword vectors."""
-        if not vec1 or not vec2:
-            return 0.0
+    def _nearest_cached_query(self, query_embedding) -> Optional[str]:
+        """Key of the cached query most similar to this one, if it reaches semantic_cache_tau."""
+        if not self._score_cache:
+            return None
         
-        # Find common terms
-        common_terms = set(vec1.keys()) & set(vec2.keys())
+        keys = list(self._score_cache)
+        queries = [self._score_cache[key][0] for key in keys]
+        if hasattr(query_embedding, "shape"):
+            # Cached queries stack into one small matrix, scored like a chunk set
+            queries = sparse_vstack(queries, format="csr")
+        scores = self._score_chunks(queries, query_embedding)
         
-        if not common_terms:
-            return 0.0
+        best = max(range(len(keys)), key=scores.__getitem__)
+        if scores[best] >= self.config.semantic_cache_tau:
+            logger.info(f"Query matches a cached query at similarity {scores[best]:.4f}")
+            return keys[best]
+        return None
+    
+    def _score_chunks(self, chunk_embeddings, query_embedding) -> List[float]:
+        """Cosine similarity between the query and every chunk row."""
+        n_embeddings = chunk_embeddings.shape[0] if hasattr(chunk_embeddings, "shape") else len(chunk_embeddings)
+        logger.info(f"Computing relevance for {n_embeddings} chunks")
+        
+        if hasattr(chunk_embeddings, "shape"):
+            # Unit-length rows: cosine similarity is one sparse matrix-vector product.
+            # A dense query turns it into a single SpMV instead of a sparse-sparse product
+            query = query_embedding.toarray().ravel()
+            if chunk_embeddings.dtype == np.int8:
+                # Quantized weights: accumulate in int32, then undo both scale factors
+                scores = chunk_embeddings @ query.astype(np.int32)
+                return (scores / (INT8_WEIGHT_SCALE * INT8_WEIGHT_SCALE)).tolist()
+            return (chunk_embeddings @ query).tolist()
+        
+        if np is not None and query_embedding:
+            return self._batched_cosine_similarity(chunk_embeddings, query_embedding)
+        
+        similarities = []
+        for chunk_vector in chunk_embeddings:
+            similarity = self._cosine_similarity(query_embedding, chunk_vector)
+            similarities.append(similarity)
+        return similarities
+    
+    def _batched_cosine_similarity(self, chunk_embeddings: List[Dict[str, float]],
+                                   query_embedding: Dict[str, float]) -> List[float]:
+        """Cosine similarity of every dict vector against the query as one dense product."""
+        # Only the query's terms contribute to a dot product, so the dense matrix needs
+        # one column per query term rather than one per vocabulary term
+        terms = list(query_embedding)
+        missing = [0.0] * len(terms)
+        matrix = np.fromiter(
+            chain.from_iterable(map(vec.get, terms, missing) for vec in chunk_embeddings),
+            dtype=np.float64, count=len(chunk_embeddings) * len(terms)
+        ).reshape(len(chunk_embeddings), len(terms))
+        
+        # Vectors are unit length, so the dot products are the cosine similarities
+        return (matrix @ np.fromiter(query_embedding.values(), dtype=np.float64,
+                                     count=len(terms))).tolist()
+    
+    def _top_rows(self, similarities: List[float], rows) -> List[Tuple[int, float]]:
+        """Sort rows by score, apply the relevance threshold and keep the top N."""
+        threshold = self.config.relevance_threshold
+        top_n = self.config.max_retrieved_chunks
+        if np is not None and 0 < top_n and len(rows) > 4 * top_n:
+            top_rows = self._partitioned_top_rows(similarities, rows, threshold, top_n)
+        else:
+            # Sort by relevance score (descending); the sort is stable, so ties keep row order
+            order = sorted(rows, key=similarities.__getitem__, reverse=True)
+            
+            # Apply relevance threshold filter
+            filtered_rows = [(i, similarities[i]) for i in order if similarities[i] >= threshold]
+            
+            # Take top N rows
+            top_rows = filtered_rows[:top_n]
         
-        # Calculate dot product
-        dot_product = sum(vec1[term] * vec2[term] for term in common_terms)
+        logger.info(f"Retrieved {len(top_rows)} relevant chunks")
+        
+        if top_rows:
+            logger.info(f"Top relevance score: {top_rows[0][1]:.4f}")
+            logger.info(f"Lowest relevance score: {top_rows[-1][1]:.4f}")
+        
+        return top_rows
+    
+    @staticmethod
+    def _partitioned_top_rows(similarities: List[float], rows, threshold: float,
+                              top_n: int) -> List[Tuple[int, float]]:
+        """Top rows via a linear-time partition, sorting only the survivors."""
+        rows = np.asarray(rows, dtype=np.intp)
+        scores = np.asarray(similarities, dtype=np.float64)[rows]
+        keep = scores >= threshold
+        rows, scores = rows[keep], scores[keep]
         
-        # Calculate magnitudes
-        magnitude1 = math.sqrt(sum(val**2 for val in vec1.values()))
-        magnitude2 = math.sqrt(sum(val**2 for val in vec2.values()))
+        if len(scores) > top_n:
+            # Keep every row tying with the N-th best score so that, as in the full
+            # stable sort, ties are broken by row order
+            nth_best = np.partition(scores, len(scores) - top_n)[len(scores) - top_n]
+            keep = scores >= nth_best
+            rows, scores = rows[keep], scores[keep]
         
-        if magnitude1 == 0 or magnitude2 == 0:
+        order = np.argsort(-scores, kind='stable')[:top_n]
+        return list(zip(rows[order].tolist(), scores[order].tolist()))
+    
+    def _cosine_similarity(self, vec1: Dict[str, float], vec2: Dict[str, float]) -> float:
+        """Calculate cosine similarity between two L2-normalized keyword vectors."""
+        if not vec1 or not vec2:
             return 0.0
         
-        return dot_product / (magnitude1 * magnitude2)
+        # Unit-length inputs: the similarity is the dot product over common terms.
+        # Walk the smaller vector and probe the larger one
+        if len(vec1) > len(vec2):
+            vec1, vec2 = vec2, vec1
+        return sum((value * vec2[term] for term, value in vec1.items() if term in vec2), 0.0)
     
     def compute_section_relevance(self, chunks_in_section: List[Dict]) -> float:
         """
@@ -107,6 +268,13 @@ class RelevanceRetriever:
         if not chunks_in_section:
             return 0.0
         
+        if np is not None:
+            # Use weighted average: higher weight for top scores, as one dot product
+            scores = np.fromiter((chunk['relevance_score'] for chunk in chunks_in_section),
+                                 dtype=np.float64, count=len(chunks_in_section))
+            weights, weights_sum = _rank_weights(len(scores))
+            return float(scores @ weights) / weights_sum
+        
         scores = [chunk['relevance_score'] for chunk in chunks_in_section]
         
         # Use weighted average: higher weight for top scores
@@ -134,18 +302,19 @@ class RelevanceRetriever:
             max_per_document = self.config.max_chunks_per_document or 10
         
         diversified = []
-        doc_counts = {}
+        doc_counts = defaultdict(int)
+        max_retrieved = self.config.max_retrieved_chunks
         
         for chunk in chunks:
             doc_name = chunk.get('source_document', 'unknown')
-            current_count = doc_counts.get(doc_name, 0)
             
-            if current_count < max_per_document:
+            if doc_counts[doc_name] < max_per_document:
                 diversified.append(chunk)
-                doc_counts[doc_name] = current_count + 1
-            
-            if len(diversified) >= self.config.max_retrieved_chunks:
-                break
+                doc_counts[doc_name] += 1
+                
+                # The list only grows here, so this is the only place it can fill up
+                if len(diversified) >= max_retrieved:
+                    break
         
         logger.info(f"Diversified results: {len(diversified)} chunks from {len(doc_counts)} documents")
         return diversified
\ No newline at end of file
@@ -1,27 +1,64 @@
 import re
 import json
+import hashlib
 import logging
 from pathlib import Path
 from typing import Any, Dict, List
-from datetime import datetime
+from datetime import datetime, timezone
+
+try:
+    import numpy as np
+except ImportError:  # _simhash counts bits with integer ops instead
+    np = None
+
+
+def _stdlib_dumps(data: Any, indent: int = 2) -> bytes:
+    return json.dumps(data, indent=indent, ensure_ascii=False, default=str).encode("utf-8")
+
+
+# JSON codec shared by the entry points and the helpers below: UTF-8 bytes in and out,
+# non-ASCII text unescaped, objects JSON has no type for written via str()
+try:
+    import orjson
+    
+    def json_loads(data: bytes) -> Any:
+        return orjson.loads(data)
+    
+    def json_dumps(data: Any, indent: int = 2) -> bytes:
+        if indent != 2:  # orjson can only indent by two spaces
+            return _stdlib_dumps(data, indent)
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str)
+except ImportError:  # Fall back to the stdlib codec, which also accepts UTF-8 bytes
+    def json_loads(data: bytes) -> Any:
+        return json.loads(data)
+    
+    json_dumps = _stdlib_dumps
 
 logger = logging.getLogger(__name__)
 
+# Width of the deduplicate_chunks SimHash signatures, and the words they are built from
+_SIMHASH_BITS = 64
+_WORD_RE = re.compile(r'\w+')
+
+# clean_text patterns, compiled once
+_ELLIPSIS_RE = re.compile(r'[.]{3,}')
+# Form feeds are whitespace, so they are already spaces by the time this runs
+_CONTROL_CHARS_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]')
+
 
 def clean_text(text: str) -> str:
     """Clean and normalize text content."""
     if not text:
         return ""
     
-    # Normalize whitespace
-    text = re.sub(r'\s+', ' ', text)
+    # Normalize whitespace (form feeds included); split() also drops the ends
+    text = ' '.join(text.split())
     
     # Remove excessive punctuation
-    text = re.sub(r'[.]{3,}', '...', text)
+    text = _ELLIPSIS_RE.sub('...', text)
     
     # Clean up common PDF artifacts
-    text = re.sub(r'\x0c', ' ', text)  # Form feed
-    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)  # Control chars
+    text = _CONTROL_CHARS_RE.sub('', text)  # Control chars
     
     return text.strip()
 
@@ -34,6 +71,11 @@ def truncate_text(text: str, max_length: int, suffix: str = "...") -> str:
     return text[:max_length - len(suffix)] + suffix
 
 
+def hash_content(text: str) -> str:
+    """Stable content key for a text (SHA-256 hex digest)."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
 def extract_filename_without_extension(path: Path) -> str:
     """Extract filename without extension from path."""
     return path.stem
@@ -59,8 +101,7 @@ def format_section_title(title: str) -> str:
 def safe_json_dump(data: Any, filepath: Path, indent: int = 2) -> bool:
     """Safely dump data to JSON file with error handling."""
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=indent, ensure_ascii=False, default=str)
+        Path(filepath).write_bytes(json_dumps(data, indent))
         return True
     except Exception as e:
         logger.error(f"Failed to write JSON to {filepath}: {e}")
@@ -70,8 +111,7 @@ def safe_json_dump(data: Any, filepath: Path, indent: int = 2) -> bool:
 def load_json_file(filepath: Path) -> Dict[str, Any]:
     """Load JSON file with error handling."""
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return json_loads(Path(filepath).read_bytes())
     except Exception as e:
         logger.error(f"Failed to load JSON from {filepath}: {e}")
         return {}
@@ -79,7 +119,8 @@ def load_json_file(filepath: Path) -> Dict[str, Any]:
 
 def get_current_timestamp() -> str:
     """Get current timestamp in ISO format."""
-    return datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
+    # Naive UTC to the millisecond: drop the "+00:00" offset isoformat appends
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds')[:-6]
 
 
 def validate_pdf_path(path: Path) -> bool:
@@ -112,47 +153,98 @@ def create_document_summary(chunks: List[Dict]) -> Dict[str, Any]:
             'documents': []
         }
     
-    total_chars = sum(len(chunk.get('text', '')) for chunk in chunks)
-    sections = list(set(chunk.get('section_title', 'Unknown') for chunk in chunks))
-    documents = list(set(chunk.get('source_document', 'Unknown') for chunk in chunks))
+    # One pass over the chunks; words are counted per chunk, which matches
+    # splitting the space-joined texts without building that string
+    total_chars = total_words = 0
+    sections = set()
+    documents = set()
+    for chunk in chunks:
+        text = chunk.get('text', '')
+        total_chars += len(text)
+        total_words += len(text.split())
+        sections.add(chunk.get('section_title', 'Unknown'))
+        documents.add(chunk.get('source_document', 'Unknown'))
     
     return {
         'total_chunks': len(chunks),
         'total_characters': total_chars,
         'sections': sorted(sections),
         'documents': sorted(documents),
-        'estimated_reading_time_minutes': estimate_reading_time(' '.join(chunk.get('text', '') for chunk in chunks))
+        'estimated_reading_time_minutes': total_words / 200
     }
 
 
 def filter_chunks_by_length(chunks: List[Dict], min_length: int = 50, max_length: int = 2000) -> List[Dict]:
     """Filter chunks by text length."""
-    filtered = []
-    
-    for chunk in chunks:
-        text_length = len(chunk.get('text', ''))
-        if min_length <= text_length <= max_length:
-            filtered.append(chunk)
+    filtered = [chunk for chunk in chunks if min_length <= len(chunk.get('text', '')) <= max_length]
     
     logger.info(f"Filtered chunks: {len(filtered)}/{len(chunks)} within length range [{min_length}, {max_length}]")
     return filtered
 
 
+def _simhash(text: str) -> int:
+    """64-bit SimHash of a text's word 3-shingles; similar texts differ in few bits."""
+    words = _WORD_RE.findall(text.lower())  # Punctuation drift does not change the shingles
+    shingles = [' '.join(words[i:i + 3]) for i in range(max(1, len(words) - 2))]
+    
+    digests = [hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest() for shingle in shingles]
+    majority = len(digests) // 2
+    
+    # Each signature bit is the majority vote of that bit over the shingle hashes
+    if np is not None:
+        counts = np.unpackbits(np.frombuffer(b''.join(digests), dtype=np.uint8)).reshape(-1, _SIMHASH_BITS).sum(axis=0)
+        return int.from_bytes(np.packbits(counts > majority).tobytes(), 'big')
+    
+    # Without numpy, add the hashes into bit-sliced counters: planes[k] holds
+    # bit k of every bit position's count
+    planes = []
+    for digest in digests:
+        carry = int.from_bytes(digest, 'big')
+        for k, plane in enumerate(planes):
+            planes[k] = plane ^ carry
+            carry &= plane
+            if not carry:
+                break
+        else:
+            planes.append(carry)
+    
+    signature = 0
+    for bit in range(_SIMHASH_BITS):
+        count = sum((plane >> bit & 1) << k for k, plane in enumerate(planes))
+        if count > majority:
+            signature |= 1 << bit
+    return signature
+
+
 def deduplicate_chunks(chunks: List[Dict], similarity_threshold: float = 0.95) -> List[Dict]:
     """Remove near-duplicate chunks based on text similarity."""
     if len(chunks) <= 1:
         return chunks
     
-    # Simple deduplication based on text length and first N characters
-    seen_signatures = set()
-    deduplicated = []
+    # SimHash signatures within this many differing bits count as duplicates
+    # (0.95 similarity -> 3 of 64 bits)
+    max_distance = int((1.0 - similarity_threshold) * _SIMHASH_BITS)
+    
+    # Pigeonhole: split signatures into max_distance + 1 blocks; two signatures that
+    # close agree exactly on at least one block, so only bucket-mates are compared
+    n_blocks = max_distance + 1
+    bounds = [_SIMHASH_BITS * i // n_blocks for i in range(n_blocks + 1)]
+    masks = [((1 << (hi - lo)) - 1) << lo for lo, hi in zip(bounds, bounds[1:])]
+    buckets = [{} for _ in masks]
     
+    deduplicated = []
     for chunk in chunks:
-        text = chunk.get('text', '')
-        signature = (len(text), text[:100] if len(text) > 100 else text)
+        signature = _simhash(chunk.get('text', ''))
+        keys = [signature & mask for mask in masks]
         
-        if signature not in seen_signatures:
-            seen_signatures.add(signature)
+        is_duplicate = any(
+            (signature ^ seen).bit_count() <= max_distance
+            for bucket, key in zip(buckets, keys)
+            for seen in bucket.get(key, ())
+        )
+        if not is_duplicate:
+            for bucket, key in zip(buckets, keys):
+                bucket.setdefault(key, []).append(signature)
             deduplicated.append(chunk)
     
     logger.info(f"Deduplicated chunks: {len(deduplicated)}/{len(chunks)} unique")